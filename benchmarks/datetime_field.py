@@ -0,0 +1,69 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+"""
+Copyright 2015 Load Impact
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import optparse
+import time
+
+from datetime import datetime, timedelta
+from loadimpact import fields
+from loadimpact.fields import DateTimeField
+from loadimpact.utils import UTC
+
+
+def strptime_coerce(value):
+    """DateTimeField.coerce() as it was, ignoring the UTC offset."""
+    return datetime.strptime(value[:-6], DateTimeField.format).replace(
+        tzinfo=UTC())
+
+
+def timestamps(n, distinct):
+    start = datetime(2015, 12, 4, 10, 0, 0)
+    return [(start + timedelta(seconds=i % distinct)).strftime(
+        DateTimeField.format) + '+00:00' for i in range(n)]
+
+
+def bench(name, func, values):
+    t = time.time()
+    for value in values:
+        func(value)
+    elapsed = time.time() - t
+    print("%-24s %.2f s, %.2f us/timestamp"
+          % (name, elapsed, elapsed * 1e6 / len(values)))
+
+
+if __name__ == "__main__":
+    p = optparse.OptionParser(
+        usage="%prog [options]",
+        description="Benchmark DateTimeField.coerce() on ISO 8601 strings.")
+    p.add_option('-n', '--timestamps', type='int', dest='n', default=1000000,
+                 help="Number of timestamps to parse.")
+    p.add_option('-d', '--distinct', type='int', dest='distinct',
+                 default=3600, help="Number of distinct timestamps.")
+    opts, args = p.parse_args()
+
+    values = timestamps(opts.n, opts.distinct)
+    unique = timestamps(opts.n, opts.n)
+    uncached = getattr(fields._parse_datetime, '__wrapped__', None)
+
+    bench('strptime', strptime_coerce, values)
+    if uncached is not None:
+        bench('slicing, uncached', uncached, values)
+    bench('coerce, repeated', DateTimeField.coerce, values)
+    fields._parse_datetime.cache_clear()
+    bench('coerce, all distinct', DateTimeField.coerce, unique)
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# coding=utf-8
+
+"""
+Copyright 2015 Load Impact
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import optparse
+import timeit
+
+from loadimpact.clients import Client
+from loadimpact.resources import Test, TestConfig
+
+
+class PayloadResponse(object):
+    status_code = 200
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def json(self):
+        return self.payload
+
+
+class PayloadClient(Client):
+    """Client answering every request with the same (decoded) payload, so
+    that only resource population is measured."""
+
+    def __init__(self, payload):
+        super(PayloadClient, self).__init__()
+        self.payload = payload
+
+    def _requests_request(self, method, *args, **kwargs):
+        return PayloadResponse(self.payload)
+
+
+def test_payload(n):
+    return [{
+        'id': i,
+        'title': 'Test %d' % i,
+        'url': 'http://example.com/%d' % i,
+        'public_url': 'https://app.loadimpact.com/test-runs/%d' % i,
+        'status': 3,
+        'status_text': 'Finished',
+        'started': '2015-12-04T10:00:00+00:00',
+        'ended': '2015-12-04T10:05:00+00:00'
+    } for i in range(n)]
+
+
+def test_config_payload(n):
+    return [{
+        'id': i,
+        'name': 'Test config %d' % i,
+        'url': 'http://example.com/%d' % i,
+        'config': {'load_schedule': [{'users': 10, 'duration': 5}],
+                   'tracks': [], 'user_type': 'sbu'},
+        'public_url': '',
+        'created': '2015-12-04T10:00:00+00:00',
+        'updated': '2015-12-04T10:05:00+00:00'
+    } for i in range(n)]
+
+
+def bench(name, resource_cls, payload, repeat, lazy=False):
+    client = PayloadClient(payload)
+    times = timeit.repeat(lambda: resource_cls.list(client, lazy=lazy),
+                          number=1, repeat=repeat)
+    print("%-18s %6d items: best %.1f ms, %.2f us/item"
+          % (name, len(payload), min(times) * 1000,
+             min(times) * 1e6 / len(payload)))
+
+
+if __name__ == "__main__":
+    p = optparse.OptionParser(
+        usage="%prog [options]",
+        description="Benchmark ListMixin.list() on large payloads.")
+    p.add_option('-n', '--items', type='int', dest='items', default=10000,
+                 help="Number of items per payload.")
+    p.add_option('-r', '--repeat', type='int', dest='repeat', default=5,
+                 help="Number of timed runs, the best one is reported.")
+    p.add_option('--lazy', action='store_true', dest='lazy', default=False,
+                 help="List with lazy field coercion.")
+    opts, args = p.parse_args()
+
+    bench('Test.list', Test, test_payload(opts.items), opts.repeat,
+          lazy=opts.lazy)
+    bench('TestConfig.list', TestConfig, test_config_payload(opts.items),
+          opts.repeat, lazy=opts.lazy)
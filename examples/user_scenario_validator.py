@@ -22,7 +22,7 @@ import sys
 import traceback
 
 from loadimpact import (
-    ApiTokenClient, ApiError, UserScenarioValidation,
+    ApiTokenClient, ApiError, UserScenarioValidation, validate_user_scenarios,
     __version__ as li_sdk_version)
 
 
@@ -49,8 +49,18 @@ def start_validation(client, user_scenario_id):
           % (UserScenarioValidation.status_code_to_text(validation.status)))
 
 
+def validate_many(client, user_scenario_ids):
+    user_scenarios = [client.get_user_scenario(user_scenario_id)
+                      for user_scenario_id in user_scenario_ids]
+
+    print("Validating %d user scenarios..." % len(user_scenarios))
+    report = validate_user_scenarios(user_scenarios)
+    print(report.summary())
+    return report.passed
+
+
 def usage():
-    print("Usage: specify a user scenario ID")
+    print("Usage: specify one or more user scenario IDs")
 
 
 if __name__ == "__main__":
@@ -66,13 +76,11 @@ if __name__ == "__main__":
         usage()
         sys.exit(2)
 
-    user_scenario_id = None
-
-    if 1 <= len(args):
-        user_scenario_id = args[0]
-
     try:
         client = ApiTokenClient(opts.api_token, debug=opts.debug)
-        start_validation(client, user_scenario_id)
+        if 1 == len(args):
+            start_validation(client, args[0])
+        elif not validate_many(client, args):
+            sys.exit(1)
     except ApiError:
         print("Error encountered: %s" % traceback.format_exc())
@@ -18,7 +18,16 @@ limitations under the License.
 
 from __future__ import absolute_import
 
+from .catalogs import *
 from .clients import *
+from .comparisons import *
 from .exceptions import *
+from .derived import *
+from .exporters import *
 from .resources import *
+from .rollups import *
+from .rules import *
+from .sinks import *
+from .stores import *
+from .validations import *
 from .version import __version__
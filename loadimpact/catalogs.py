@@ -0,0 +1,252 @@
+# coding=utf-8
+
+"""
+Copyright 2015 Load Impact
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+
+__all__ = ['ResultCatalog', 'ResultIndex']
+
+import threading
+
+from fnmatch import fnmatchcase
+from .exceptions import ClientError
+from .resources import LoadZone, ResultKey, TestResult
+
+
+class ResultCatalog(object):
+    """Catalog of the result IDs available for tests.
+
+    Result IDs are listed from the API, or if the API can't list them,
+    enumerated from the test configuration the test was started from. They
+    are cached per test, and can be selected with shell style patterns, e.g.
+    '__li_url_*:11:*' for all URL results in load zone 11.
+    """
+
+    # Results without load zone.
+    GLOBAL_RESULTS = (
+        TestResult.LIVE_FEEDBACK,
+        TestResult.LOG,
+        TestResult.PROGRESS_PERCENT
+    )
+
+    # Results per load zone.
+    LOAD_ZONE_RESULTS = (
+        TestResult.ACCUMULATED_LOAD_TIME,
+        TestResult.ACTIVE_USERS,
+        TestResult.ACTIVE_CONNECTIONS,
+        TestResult.BANDWIDTH,
+        TestResult.FAILURE_RATE,
+        TestResult.LOAD_GENERATOR_CPU_UTILIZATION,
+        TestResult.LOAD_GENERATOR_MEMORY_UTILIZATION,
+        TestResult.REQUESTS_PER_SECOND,
+        TestResult.TOTAL_BYTES_RECEIVED,
+        TestResult.TOTAL_REQUESTS,
+        TestResult.USER_LOAD_TIME
+    )
+
+    # Results per load zone and user scenario.
+    USER_SCENARIO_RESULTS = (
+        TestResult.USER_LOAD_TIME,
+        TestResult.USER_SCENARIO_REPETITION_SUCCESS_RATE,
+        TestResult.USER_SCENARIO_REPETITION_FAILURE_RATE
+    )
+
+    def __init__(self):
+        self.names = {}
+        self._result_ids = {}
+        self._lock = threading.Lock()
+
+    def result_ids(self, test, test_config=None, refresh=False):
+        """Get result IDs available for a test.
+
+        Args:
+            test: Test resource instance.
+            test_config: Test configuration the test was started from, used
+                to enumerate result IDs if the API can't list them.
+            refresh: Whether to bypass the cache.
+
+        Returns:
+            Sorted list of result IDs.
+
+        Raises:
+            ClientError: API can't list result IDs and no test configuration
+                was given.
+            ResponseParseError: Unable to parse response from API.
+        """
+        with self._lock:
+            cached = self._result_ids.get(test.id)
+        if cached is not None and not refresh:
+            return cached
+        try:
+            result_ids = []
+            for rid in test.result_ids():
+                result_ids.append(rid['id'])
+                if rid['name'] is not None:
+                    self.names[rid['id']] = rid['name']
+                    TestResult.register_name(rid['name'])
+        except ClientError:
+            if test_config is None:
+                raise
+            result_ids = self.__class__.result_ids_from_config(test_config)
+        result_ids = sorted(set(result_ids))
+        with self._lock:
+            self._result_ids[test.id] = result_ids
+        return result_ids
+
+    def match(self, test, *patterns, **kwargs):
+        """Get result IDs of a test matching any of a number of patterns.
+
+        Args:
+            test: Test resource instance.
+            patterns: Shell style patterns, e.g. '__li_url_*:11:*'.
+            test_config: See result_ids().
+
+        Returns:
+            Sorted list of matching result IDs.
+        """
+        return [rid for rid in self.result_ids(test, **kwargs)
+                if any(fnmatchcase(rid, p) for p in patterns)]
+
+    def result_stream(self, test, *patterns, **kwargs):
+        """Get result stream of a test subscribed to all result IDs matching
+        any of a number of patterns.
+
+        Args:
+            test: Test resource instance.
+            patterns: Shell style patterns, e.g. '__li_url_*:11:*'.
+            test_config: See result_ids().
+
+        Returns:
+            Test result stream object.
+
+        Raises:
+            ValueError: No result IDs matched.
+        """
+        result_ids = self.match(test, *patterns, **kwargs)
+        if not result_ids:
+            raise ValueError("No result IDs match %s" % ', '.join(patterns))
+        return test.result_stream(result_ids)
+
+    def invalidate(self, test=None):
+        """Drop cached result IDs of a test, or of all tests."""
+        with self._lock:
+            if test is None:
+                self._result_ids.clear()
+            else:
+                self._result_ids.pop(test.id, None)
+
+    @classmethod
+    def result_ids_from_config(cls, test_config):
+        """Enumerate standard result IDs for the load zones and user scenarios
+        of a test configuration.
+
+        Args:
+            test_config: Test configuration resource instance.
+
+        Returns:
+            List of result IDs.
+        """
+        zones = {LoadZone.name_to_id(LoadZone.AGGREGATE_WORLD): set()}
+        for track in test_config.config.get('tracks', []):
+            zone = track.get('loadzone')
+            if not isinstance(zone, int):
+                zone = LoadZone.name_to_id(zone)
+            scenarios = zones.setdefault(zone, set())
+            for clip in track.get('clips', []):
+                scenarios.add(clip['user_scenario_id'])
+                zones[LoadZone.name_to_id(LoadZone.AGGREGATE_WORLD)].add(
+                    clip['user_scenario_id'])
+
+        result_ids = list(cls.GLOBAL_RESULTS)
+        for zone, scenarios in zones.items():
+            for name in cls.LOAD_ZONE_RESULTS:
+                result_ids.append(TestResult.result_id_from_name(
+                    name, load_zone_id=zone))
+            for scenario in scenarios:
+                for name in cls.USER_SCENARIO_RESULTS:
+                    result_ids.append(TestResult.result_id_from_name(
+                        name, load_zone_id=zone, user_scenario_id=scenario))
+        return result_ids
+
+
+class ResultIndex(object):
+    """Index of result IDs by the parts of their parsed keys (see
+    TestResult.parse_result_id()), for grouping and selecting results by
+    kind, metric, name, load zone, user scenario, status code or method
+    without re-parsing result IDs.
+    """
+
+    DIMENSIONS = ResultKey._fields
+
+    def __init__(self, result_ids=None):
+        self._keys = {}
+        self._index = dict([(d, {}) for d in self.__class__.DIMENSIONS])
+        if result_ids:
+            self.add(result_ids)
+
+    def __contains__(self, result_id):
+        return result_id in self._keys
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, result_ids):
+        """Add result IDs to the index."""
+        for rid in result_ids:
+            if rid in self._keys:
+                continue
+            key = TestResult.parse_result_id(rid)
+            self._keys[rid] = key
+            for dimension, value in zip(self.__class__.DIMENSIONS, key):
+                self._index[dimension].setdefault(value, set()).add(rid)
+
+    def key(self, result_id):
+        """Get parsed key of an indexed result ID."""
+        return self._keys[result_id]
+
+    def group_by(self, dimension):
+        """Group indexed result IDs by one dimension.
+
+        Args:
+            dimension: Name of a ResultKey field, e.g. 'load_zone_id'.
+
+        Returns:
+            Dict of dimension value to sorted list of result IDs.
+        """
+        return dict([(value, sorted(rids))
+                     for value, rids in self._index[dimension].items()])
+
+    def select(self, **criteria):
+        """Select indexed result IDs by dimension values.
+
+        Args:
+            criteria: ResultKey field names and required values, e.g.
+                kind='url', load_zone_id=11.
+
+        Returns:
+            Sorted list of result IDs matching all criteria.
+        """
+        if not criteria:
+            return sorted(self._keys)
+        sets = []
+        for dimension, value in criteria.items():
+            rids = self._index[dimension].get(value)
+            if not rids:
+                return []
+            sets.append(rids)
+        sets.sort(key=len)
+        return sorted(sets[0].intersection(*sets[1:]))
@@ -35,7 +35,8 @@ from .exceptions import (
     MissingApiTokenError, NotFoundError, RateLimitError, ServerError,
     TimeoutError, UnauthorizedError)
 from .resources import (
-    DataStore, Test, TestConfig, UserScenario, UserScenarioValidation)
+    DataStore, IdentityMap, Test, TestConfig, UserScenario,
+    UserScenarioValidation)
 
 try:
     from urlparse import urljoin
@@ -80,43 +81,54 @@ class Client(object):
                                                    requests.__version__)
     user_agent = "LoadImpactPythonSDK/%s (%s)" % (__version__, library_versions)
 
-    def __init__(self, timeout=default_timeout, debug=False):
+    def __init__(self, timeout=default_timeout, debug=False,
+                 identity_map=False):
+        """Create client.
+
+        Args:
+            timeout: Request timeout, in seconds.
+            debug: Whether to log HTTP traffic.
+            identity_map: Whether to keep one resource instance per resource
+                (see IdentityMap), so that getting or listing a resource
+                again merges fresh data into the instance already loaded.
+        """
         self.timeout = timeout
+        self.identity_map = IdentityMap() if identity_map else None
         if debug:
             httplib.HTTPConnection.debuglevel = 1
 
     def create_data_store(self, data, file_object):
         return DataStore.create(self, data, file_object=file_object)
 
-    def get_data_store(self, resource_id):
-        return DataStore.get(self, resource_id)
+    def get_data_store(self, resource_id, lazy=False, **kwargs):
+        return DataStore.get(self, resource_id, lazy=lazy, **kwargs)
 
-    def list_data_stores(self):
-        return DataStore.list(self)
+    def list_data_stores(self, lazy=False, **kwargs):
+        return DataStore.list(self, lazy=lazy, **kwargs)
 
-    def get_test(self, resource_id):
-        return Test.get(self, resource_id)
+    def get_test(self, resource_id, lazy=False, **kwargs):
+        return Test.get(self, resource_id, lazy=lazy, **kwargs)
 
-    def list_tests(self):
-        return Test.list(self)
+    def list_tests(self, lazy=False, **kwargs):
+        return Test.list(self, lazy=lazy, **kwargs)
 
     def create_test_config(self, data):
         return TestConfig.create(self, data)
 
-    def get_test_config(self, resource_id):
-        return TestConfig.get(self, resource_id)
+    def get_test_config(self, resource_id, lazy=False, **kwargs):
+        return TestConfig.get(self, resource_id, lazy=lazy, **kwargs)
 
-    def list_test_configs(self):
-        return TestConfig.list(self)
+    def list_test_configs(self, lazy=False, **kwargs):
+        return TestConfig.list(self, lazy=lazy, **kwargs)
 
     def create_user_scenario(self, data):
         return UserScenario.create(self, data)
 
-    def get_user_scenario(self, resource_id):
-        return UserScenario.get(self, resource_id)
+    def get_user_scenario(self, resource_id, lazy=False, **kwargs):
+        return UserScenario.get(self, resource_id, lazy=lazy, **kwargs)
 
-    def list_user_scenarios(self):
-        return UserScenario.list(self)
+    def list_user_scenarios(self, lazy=False, **kwargs):
+        return UserScenario.list(self, lazy=lazy, **kwargs)
 
     def create_user_scenario_validation(self, data):
         return UserScenarioValidation.create(self, data)
@@ -0,0 +1,305 @@
+# coding=utf-8
+
+"""
+Copyright 2015 Load Impact
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+
+__all__ = ['MetricComparison', 'RunComparison']
+
+import math
+
+from collections import namedtuple
+from .resources import LoadZone, TestResult
+from .utils import numeric_value, optional_import
+
+
+MetricComparison = namedtuple('MetricComparison', [
+    'result_id', 'samples', 'baseline', 'candidate', 'delta',
+    'relative_delta', 't', 'p_value', 'regression'])
+
+
+def _nan_if_none(value):
+    return float('nan') if value is None else value
+
+
+def _arrays(data):
+    """Get timestamp and value arrays of the numeric data points of a
+    series."""
+    numpy = optional_import('numpy')
+    n = len(data)
+    timestamps = numpy.fromiter(
+        (_nan_if_none(p.get('timestamp')) for p in data), dtype=float,
+        count=n)
+    values = numpy.fromiter(
+        (_nan_if_none(numeric_value(p)) for p in data), dtype=float, count=n)
+    mask = numpy.isfinite(timestamps) & numpy.isfinite(values)
+    return timestamps[mask], values[mask]
+
+
+def _betacf(a, b, x):
+    """Continued fraction of the regularized incomplete beta function
+    (modified Lentz's method)."""
+    tiny = 1e-300
+    c = 1.0
+    d = 1.0 - (a + b) * x / (a + 1.0)
+    d = 1.0 / (d if abs(d) > tiny else tiny)
+    h = d
+    for m in range(1, 301):
+        m2 = 2 * m
+        for aa in (m * (b - m) * x / ((a + m2 - 1.0) * (a + m2)),
+                   -(a + m) * (a + b + m) * x / ((a + m2) * (a + m2 + 1.0))):
+            d = 1.0 + aa * d
+            d = 1.0 / (d if abs(d) > tiny else tiny)
+            c = 1.0 + aa / c
+            c = c if abs(c) > tiny else tiny
+            h *= d * c
+        if abs(d * c - 1.0) < 1e-15:
+            break
+    return h
+
+
+def _betainc(a, b, x):
+    """Regularized incomplete beta function I_x(a, b)."""
+    if x <= 0.0:
+        return 0.0
+    if x >= 1.0:
+        return 1.0
+    front = math.exp(math.lgamma(a + b) - math.lgamma(a) - math.lgamma(b) +
+                     a * math.log(x) + b * math.log(1.0 - x))
+    if x < (a + 1.0) / (a + b + 2.0):
+        return front * _betacf(a, b, x) / a
+    return 1.0 - front * _betacf(b, a, 1.0 - x) / b
+
+
+def _t_p_value(t, df):
+    """Two-sided p-value of Student's t statistic with df degrees of
+    freedom."""
+    if math.isinf(t):
+        return 0.0
+    return _betainc(df / 2.0, 0.5, df / (df + t * t))
+
+
+def _bucket_means(keys, values):
+    """Get sorted unique bucket keys and the mean value of each bucket."""
+    numpy = optional_import('numpy')
+    unique, inverse = numpy.unique(keys, return_inverse=True)
+    sums = numpy.bincount(inverse, weights=values)
+    counts = numpy.bincount(inverse)
+    return unique, sums / counts
+
+
+class RunComparison(object):
+    """Comparison of the result series of two test runs, e.g. of a new
+    release against a baseline.
+
+    Series of both runs are time aligned, either by time elapsed since the
+    start of each run or by the number of active users when each data point
+    was recorded, and averaged per bucket of alignment. For every result
+    present in both runs the mean difference over the buckets both runs have
+    values for is computed, together with a paired t-test of the per bucket
+    differences (two-sided p-value from Student's t distribution with n - 1
+    degrees of freedom for n buckets). A result is flagged as a regression
+    when it got worse by at least `threshold` (relative to baseline) with a
+    p-value below `alpha`.
+
+    All computation is done on NumPy arrays, one result at a time.
+    """
+
+    ALIGN_ELAPSED = 'elapsed'
+    ALIGN_USERS = 'users'
+
+    # Metrics where a decrease, rather than an increase, is a regression.
+    HIGHER_IS_BETTER = frozenset([
+        TestResult.BANDWIDTH,
+        TestResult.REQUESTS_PER_SECOND,
+        TestResult.USER_SCENARIO_REPETITION_SUCCESS_RATE
+    ])
+
+    def __init__(self, baseline, candidate, align=ALIGN_ELAPSED,
+                 resolution=10, users_result_id=None, threshold=0.1,
+                 alpha=0.05):
+        """Create comparison.
+
+        Args:
+            baseline: Dict of result ID to list of data points of baseline
+                run, e.g. as returned by Test.fetch_results() or
+                ResultStore.load().
+            candidate: Dict of result ID to list of data points of run to
+                compare with the baseline.
+            align: ALIGN_ELAPSED or ALIGN_USERS.
+            resolution: Bucket width, in seconds when aligning by elapsed
+                time and in number of users when aligning by active users.
+            users_result_id: Result ID of active users series to align by,
+                the aggregate of all load zones by default. Must be present
+                in both runs when aligning by active users.
+            threshold: Minimum relative change to flag as regression.
+            alpha: Maximum p-value to flag as regression.
+
+        Raises:
+            ImportError: NumPy is not available.
+            ValueError: Unknown alignment, or active users series missing.
+        """
+        if optional_import('numpy') is None:
+            raise ImportError("RunComparison requires numpy")
+        if align not in (self.__class__.ALIGN_ELAPSED,
+                         self.__class__.ALIGN_USERS):
+            raise ValueError("Unknown alignment '%s'" % align)
+        self.align = align
+        self.resolution = resolution
+        self.threshold = threshold
+        self.alpha = alpha
+        if users_result_id is None:
+            users_result_id = TestResult.result_id_from_name(
+                TestResult.ACTIVE_USERS,
+                load_zone_id=LoadZone.name_to_id(LoadZone.AGGREGATE_WORLD))
+        self.users_result_id = users_result_id
+        self._runs = [self._prepare(baseline), self._prepare(candidate)]
+
+    @classmethod
+    def from_tests(cls, baseline_test, candidate_test, result_ids,
+                   store=None, **kwargs):
+        """Compare two tests, fetching their results.
+
+        Args:
+            baseline_test: Baseline test resource instance.
+            candidate_test: Test resource instance to compare.
+            result_ids: List of result IDs to compare. The active users
+                series is fetched too when aligning by active users.
+            store: Optional result store to load results through, fetching
+                only data points not stored yet.
+            kwargs: See __init__().
+
+        Returns:
+            RunComparison instance.
+        """
+        result_ids = list(result_ids)
+        if kwargs.get('align') == cls.ALIGN_USERS:
+            users_result_id = kwargs.get('users_result_id') or \
+                TestResult.result_id_from_name(
+                    TestResult.ACTIVE_USERS,
+                    load_zone_id=LoadZone.name_to_id(
+                        LoadZone.AGGREGATE_WORLD))
+            if users_result_id not in result_ids:
+                result_ids.append(users_result_id)
+        if store is not None:
+            fetch = lambda test: store.load(test, result_ids)
+        else:
+            fetch = lambda test: test.fetch_results(result_ids)
+        return cls(fetch(baseline_test), fetch(candidate_test), **kwargs)
+
+    @property
+    def result_ids(self):
+        """Sorted list of result IDs present in both runs."""
+        baseline, candidate = self._runs
+        return sorted(set(baseline).intersection(candidate))
+
+    def aligned(self, result_id):
+        """Get aligned bucket means of a result in both runs.
+
+        Args:
+            result_id: Result ID present in both runs.
+
+        Returns:
+            Tuple of (bucket keys, baseline means, candidate means) NumPy
+            arrays, for the buckets both runs have values for. Keys are
+            bucket start times in seconds since start of run, or bucket
+            start active user counts.
+        """
+        numpy = optional_import('numpy')
+        baseline, candidate = [run[result_id] for run in self._runs]
+        keys, ib, ic = numpy.intersect1d(baseline[0], candidate[0],
+                                         assume_unique=True,
+                                         return_indices=True)
+        return keys * self.resolution, baseline[1][ib], candidate[1][ic]
+
+    def compare(self, result_id):
+        """Compare a result between runs.
+
+        Args:
+            result_id: Result ID present in both runs.
+
+        Returns:
+            MetricComparison, with None for statistics that are undefined
+            for the number of aligned buckets.
+        """
+        keys, baseline, candidate = self.aligned(result_id)
+        n = len(keys)
+        if not n:
+            return MetricComparison(result_id, 0, None, None, None, None,
+                                    None, None, False)
+        diff = candidate - baseline
+        baseline_mean = float(baseline.mean())
+        candidate_mean = float(candidate.mean())
+        delta = candidate_mean - baseline_mean
+        relative = delta / abs(baseline_mean) if baseline_mean else None
+        t = p_value = None
+        if n > 1:
+            sd = float(diff.std(ddof=1))
+            if sd:
+                t = float(diff.mean()) / (sd / math.sqrt(n))
+            else:
+                t = math.copysign(float('inf'), delta) if delta else 0.0
+            p_value = _t_p_value(t, n - 1)
+        metric = TestResult.parse_result_id(result_id).metric
+        worse = (delta < 0 if metric in self.__class__.HIGHER_IS_BETTER
+                 else delta > 0)
+        regression = bool(
+            worse and p_value is not None and p_value < self.alpha and
+            (relative is None or abs(relative) >= self.threshold))
+        return MetricComparison(result_id, n, baseline_mean, candidate_mean,
+                                delta, relative, t, p_value, regression)
+
+    def compare_all(self):
+        """Compare all results present in both runs.
+
+        Returns:
+            List of MetricComparison, ordered by result ID.
+        """
+        return [self.compare(rid) for rid in self.result_ids]
+
+    def regressions(self):
+        """Get comparisons of results flagged as regressions."""
+        return [c for c in self.compare_all() if c.regression]
+
+    def _prepare(self, series):
+        """Bucket the series of a run by alignment key."""
+        numpy = optional_import('numpy')
+        arrays = dict([(rid, _arrays(data)) for rid, data in series.items()])
+        if self.align == self.__class__.ALIGN_USERS:
+            if self.users_result_id not in arrays:
+                raise ValueError("Active users series '%s' is required to "
+                                 "align by active users" %
+                                 self.users_result_id)
+            users_ts, users = arrays[self.users_result_id]
+            order = numpy.argsort(users_ts, kind='mergesort')
+            users_ts, users = users_ts[order], users[order]
+        else:
+            starts = [ts.min() for ts, _ in arrays.values() if len(ts)]
+            origin = min(starts) if starts else 0.0
+            width = self.resolution * TestResult.TIMESTAMP_RESOLUTION
+
+        prepared = {}
+        for rid, (timestamps, values) in arrays.items():
+            if self.align == self.__class__.ALIGN_USERS:
+                i = numpy.searchsorted(users_ts, timestamps, side='right') - 1
+                known = i >= 0
+                keys = numpy.floor(users[i[known]] / self.resolution)
+                values = values[known]
+            else:
+                keys = numpy.floor((timestamps - origin) / width)
+            prepared[rid] = _bucket_means(keys.astype(numpy.int64), values)
+        return prepared
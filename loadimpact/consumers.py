@@ -0,0 +1,43 @@
+# coding=utf-8
+
+"""
+Copyright 2015 Load Impact
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+
+__all__ = ['ResultConsumer']
+
+
+class ResultConsumer(object):
+    """All objects attached to a test result stream derive from this base
+    class.
+
+    A consumer is fed every batch of new data points the stream ingests, as a
+    dict mapping result IDs to lists of data points (dicts with 'offset',
+    'timestamp' and 'value' keys), once per poll.
+    """
+
+    def consume(self, stream, batch):
+        """Handle a batch of new data points.
+
+        Args:
+            stream: Test result stream the batch was ingested by.
+            batch: Dict of result ID to list of new data points.
+        """
+        raise NotImplementedError
+
+    def finish(self, stream):
+        """Called once when the stream has completed."""
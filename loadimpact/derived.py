@@ -0,0 +1,205 @@
+# coding=utf-8
+
+"""
+Copyright 2015 Load Impact
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+
+__all__ = ['DerivedMetric', 'DerivedMetrics']
+
+from .consumers import ResultConsumer
+from .resources import TestResult
+from .utils import numeric_value, optional_import
+
+
+class DerivedMetric(object):
+    """Metric computed from time aligned values of other results.
+
+    Computation is done a batch of aligned rows at a time: with NumPy
+    available and a vector function given, on whole float arrays, otherwise
+    row by row using the scalar function. Both functions must return None
+    (respectively NaN or infinity) for undefined values.
+    """
+
+    def __init__(self, name, inputs, func, vector_func=None):
+        """Create derived metric.
+
+        Args:
+            name: Name of derived series.
+            inputs: List of input result IDs.
+            func: Function of one value per input, returning the derived value.
+            vector_func: Optional equivalent of func operating on one NumPy
+                array per input.
+        """
+        self.name = name
+        self.inputs = list(inputs)
+        self.func = func
+        self.vector_func = vector_func
+
+    def __repr__(self):
+        return "<DerivedMetric %s(%s)>" % (self.name, ', '.join(self.inputs))
+
+    @classmethod
+    def ratio(cls, name, numerator, denominator, scale=1.0):
+        """Derived metric numerator / denominator * scale, e.g. bytes per
+        request from TOTAL_BYTES_RECEIVED and TOTAL_REQUESTS."""
+        return cls(name, [numerator, denominator],
+                   lambda x, y: x / float(y) * scale if y else None,
+                   lambda x, y: x / y * scale)
+
+    @classmethod
+    def product(cls, name, a, b, scale=1.0):
+        """Derived metric a * b * scale, e.g. errors per second from
+        FAILURE_RATE (in percent, scale 0.01) and REQUESTS_PER_SECOND."""
+        return cls(name, [a, b], lambda x, y: x * y * scale,
+                   lambda x, y: x * y * scale)
+
+    def compute(self, columns):
+        """Compute derived values.
+
+        Args:
+            columns: One list of values per input, all of the same length.
+
+        Returns:
+            List of derived values, None where undefined.
+        """
+        numpy = None
+        if self.vector_func is not None:
+            numpy = optional_import('numpy')
+        if numpy is not None:
+            arrays = [numpy.asarray(c, dtype=float) for c in columns]
+            with numpy.errstate(divide='ignore', invalid='ignore'):
+                out = numpy.asarray(self.vector_func(*arrays), dtype=float)
+            out = numpy.where(numpy.isfinite(out), out, numpy.nan)
+            return [None if v != v else v for v in out.tolist()]
+        return [self.func(*row) for row in zip(*columns)]
+
+
+class _Aligner(object):
+    """Aligns values of several inputs on timestamps bucketed by a given
+    resolution, holding values back until every input has reached the
+    bucket."""
+
+    def __init__(self, inputs, resolution):
+        self.inputs = inputs
+        self.resolution = resolution
+        self.pending = dict([(rid, {}) for rid in inputs])
+        self.latest = dict([(rid, None) for rid in inputs])
+
+    def add(self, rid, data):
+        pending = self.pending[rid]
+        for point in data:
+            value = numeric_value(point)
+            timestamp = point.get('timestamp')
+            if value is None or timestamp is None:
+                continue
+            if self.resolution:
+                timestamp //= self.resolution
+            pending[timestamp] = value
+            self.latest[rid] = timestamp
+
+    def pop_complete(self):
+        """Pop complete rows.
+
+        Returns:
+            Tuple of (list of bucket keys, list of columns), ordered by key.
+        """
+        smallest = min(self.pending.values(), key=len)
+        keys = sorted(k for k in smallest
+                      if all(k in p for p in self.pending.values()))
+        columns = [[self.pending[rid].pop(k) for k in keys]
+                   for rid in self.inputs]
+        # Buckets every input has moved past can never complete.
+        if None not in self.latest.values():
+            horizon = min(self.latest.values())
+            for p in self.pending.values():
+                for k in [k for k in p if k < horizon]:
+                    del p[k]
+        return keys, columns
+
+
+class DerivedMetrics(ResultConsumer):
+    """Computes derived metrics on data points ingested by a test result
+    stream, as soon as all their inputs have arrived.
+
+    Derived data points have the same shape as result data points, with
+    offsets counted per derived series, and are appended to `series` and fed
+    as batches to downstream consumers (e.g. a result store or a rollup).
+    """
+
+    def __init__(self, metrics, resolution=1, consumers=None):
+        """Create derived metric pipeline.
+
+        Args:
+            metrics: List of DerivedMetric instances.
+            resolution: Seconds input timestamps are bucketed by when aligning
+                them, 0 to require exactly equal timestamps.
+            consumers: List of result consumers to feed derived batches to.
+        """
+        self.metrics = list(metrics)
+        self.resolution = resolution
+        self.series = dict([(m.name, []) for m in self.metrics])
+        self._consumers = list(consumers or [])
+        self._aligners = [
+            _Aligner(m.inputs, resolution * TestResult.TIMESTAMP_RESOLUTION)
+            for m in self.metrics]
+
+    def attach(self, consumer):
+        """Attach a consumer to feed derived batches to."""
+        self._consumers.append(consumer)
+        return consumer
+
+    def consume(self, stream, batch):
+        derived = self.add(batch)
+        if derived:
+            for consumer in self._consumers:
+                consumer.consume(stream, derived)
+
+    def finish(self, stream):
+        for consumer in self._consumers:
+            consumer.finish(stream)
+
+    def add(self, batch):
+        """Add a batch of input data points.
+
+        Args:
+            batch: Dict of result ID to list of data points.
+
+        Returns:
+            Dict of derived series name to list of new derived data points.
+        """
+        derived = {}
+        for metric, aligner in zip(self.metrics, self._aligners):
+            touched = False
+            for rid in metric.inputs:
+                if rid in batch:
+                    aligner.add(rid, batch[rid])
+                    touched = True
+            if not touched:
+                continue
+            keys, columns = aligner.pop_complete()
+            if not keys:
+                continue
+            scale = aligner.resolution or 1
+            series = self.series[metric.name]
+            offset = len(series)
+            points = [{'offset': offset + i, 'timestamp': key * scale,
+                       'value': value}
+                      for i, (key, value) in enumerate(
+                          zip(keys, metric.compute(columns)))]
+            series.extend(points)
+            derived[metric.name] = points
+        return derived
@@ -0,0 +1,249 @@
+# coding=utf-8
+
+"""
+Copyright 2015 Load Impact
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+
+__all__ = ['PrometheusExporter', 'StatsdExporter']
+
+import os
+import re
+import socket
+import threading
+
+from .consumers import ResultConsumer
+from .resources import TestResult
+from .utils import numeric_value
+
+try:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+
+def _metric_name(key):
+    """Metric name of a parsed result ID, e.g. 'user_load_time' for
+    '__li_user_load_time:1' and 'url' for '__li_url_<md5>:1:1:200:GET'."""
+    name = key.metric
+    for prefix in ('__li_', '__'):
+        if name.startswith(prefix):
+            name = name[len(prefix):]
+            break
+    return re.sub(r'[^a-zA-Z0-9_]', '_', name.rstrip('_'))
+
+
+def _latest_values(batch):
+    """Get the latest numeric value of every result in a batch."""
+    latest = {}
+    for rid, data in batch.items():
+        for point in reversed(data):
+            value = numeric_value(point)
+            if value is not None:
+                latest[rid] = value
+                break
+    return latest
+
+
+class StatsdExporter(ResultConsumer):
+    """Pushes the latest value of every result in each batch ingested by a
+    test result stream to StatsD as gauges, packing as many gauges as fit
+    into each UDP datagram.
+
+    Gauges are named <prefix>.test_<test ID>.<metric>[.<name hash>]
+    [.zone_<load zone ID>][.scenario_<user scenario ID>][.<status code>]
+    [.<method>].
+    """
+
+    def __init__(self, host='localhost', port=8125, prefix='loadimpact',
+                 max_packet_size=1432):
+        self.address = (host, port)
+        self.prefix = prefix
+        self.max_packet_size = max_packet_size
+        self.packets_sent = 0
+        self._names = {}
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def close(self):
+        self._socket.close()
+
+    def consume(self, stream, batch):
+        self.send(stream.test.id, batch)
+
+    def send(self, test_id, batch):
+        """Send gauges for the latest values of a batch of data points.
+
+        Args:
+            test_id: ID of test the data points belong to.
+            batch: Dict of result ID to list of data points.
+        """
+        packet = []
+        size = 0
+        for rid, value in _latest_values(batch).items():
+            name = self.gauge_name(test_id, rid)
+            if value < 0:
+                # A signed gauge value is a delta in StatsD, so reset first.
+                line = '%s:0|g\n%s:%r|g' % (name, name, value)
+            else:
+                line = '%s:%r|g' % (name, value)
+            line = line.encode('utf-8')
+            if packet and size + 1 + len(line) > self.max_packet_size:
+                self._send(packet)
+                packet = []
+                size = 0
+            size += len(line) + (1 if packet else 0)
+            packet.append(line)
+        if packet:
+            self._send(packet)
+
+    def gauge_name(self, test_id, result_id):
+        """Get gauge name of a result of a test."""
+        name = self._names.get((test_id, result_id))
+        if name is None:
+            key = TestResult.parse_result_id(result_id)
+            parts = [self.prefix, 'test_%s' % test_id, _metric_name(key)]
+            if key.name_hash:
+                parts.append(key.name_hash)
+            if key.load_zone_id is not None:
+                parts.append('zone_%s' % key.load_zone_id)
+            if key.user_scenario_id is not None:
+                parts.append('scenario_%s' % key.user_scenario_id)
+            if key.status_code is not None:
+                parts.append(str(key.status_code))
+            if key.method is not None:
+                parts.append(key.method)
+            name = '.'.join(re.sub(r'[^a-zA-Z0-9_\-]', '_', str(p))
+                            for p in parts if p)
+            self._names[(test_id, result_id)] = name
+        return name
+
+    def _send(self, lines):
+        self._socket.sendto(b'\n'.join(lines), self.address)
+        self.packets_sent += 1
+
+
+class PrometheusExporter(ResultConsumer):
+    """Exposes the latest value of every result ingested by a test result
+    stream in the Prometheus text format, as a textfile for the node
+    exporter's textfile collector and/or over HTTP.
+
+    Memory is bounded by the number of results, as only the latest value of
+    each is kept. Results are exported as gauges named loadimpact_<metric>,
+    labelled with test ID and the parts of their result ID.
+    """
+
+    LABELS = ('name_hash', 'load_zone_id', 'user_scenario_id', 'status_code',
+              'method')
+
+    def __init__(self, path=None, prefix='loadimpact'):
+        """Create exporter.
+
+        Args:
+            path: Path of textfile to (atomically) rewrite after every batch,
+                if any.
+            prefix: Metric name prefix.
+        """
+        self.path = path
+        self.prefix = prefix
+        self._samples = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def consume(self, stream, batch):
+        self.update(stream.test.id, batch)
+        if self.path:
+            self.write_textfile(self.path)
+
+    def update(self, test_id, batch):
+        """Update latest values from a batch of data points.
+
+        Args:
+            test_id: ID of test the data points belong to.
+            batch: Dict of result ID to list of data points.
+        """
+        latest = _latest_values(batch)
+        with self._lock:
+            for rid, value in latest.items():
+                self._samples[(test_id, rid)] = value
+
+    def render(self):
+        """Render latest values in the Prometheus text exposition format."""
+        metrics = {}
+        with self._lock:
+            samples = list(self._samples.items())
+        for (test_id, rid), value in samples:
+            key = TestResult.parse_result_id(rid)
+            name = '%s_%s' % (self.prefix, _metric_name(key))
+            labels = [('test_id', test_id)]
+            for label in self.__class__.LABELS:
+                label_value = getattr(key, label)
+                if label_value is not None:
+                    labels.append((label, label_value))
+            labels = ','.join('%s="%s"' % (k, str(v).replace('\\', '\\\\')
+                                                    .replace('"', '\\"'))
+                              for k, v in labels)
+            metrics.setdefault(name, []).append(
+                '%s{%s} %r' % (name, labels, float(value)))
+        lines = []
+        for name in sorted(metrics):
+            lines.append('# TYPE %s gauge' % name)
+            lines.extend(sorted(metrics[name]))
+        return '\n'.join(lines) + '\n' if lines else ''
+
+    def write_textfile(self, path):
+        """Atomically write rendered values to a textfile."""
+        tmp = '%s.%d.tmp' % (path, os.getpid())
+        with open(tmp, 'w') as f:
+            f.write(self.render())
+        os.rename(tmp, path)
+
+    def serve(self, port=9108, host=''):
+        """Serve rendered values over HTTP from a background thread.
+
+        Args:
+            port: Port to listen on, 0 to pick a free one.
+            host: Interface to listen on, all by default.
+
+        Returns:
+            Port listened on.
+        """
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = exporter.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type',
+                                 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = HTTPServer((host, port), Handler)
+        thread = threading.Thread(target=self._server.serve_forever)
+        thread.daemon = True
+        thread.start()
+        return self._server.server_address[1]
+
+    def shutdown(self):
+        """Stop serving over HTTP."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -23,9 +23,12 @@ __all__ = ['DateTimeField', 'DictField', 'FloatField', 'IntegerField',
 
 import sys
 
-from datetime import datetime
+from datetime import datetime, timedelta
 from .exceptions import CoercionError
-from .utils import UTC
+from .utils import UTC, lru_cache
+
+
+_UTC = UTC()
 
 
 class Field(object):
@@ -72,6 +75,41 @@ class Field(object):
         return cls.field_type()
 
 
+@lru_cache(maxsize=8192)
+def _parse_datetime(value):
+    """Parse an ISO 8601 date and time, e.g. '2015-12-04T10:00:00+01:00',
+    by slicing, into a datetime in UTC. A missing UTC offset means UTC."""
+    if (len(value) < 19 or '-' != value[4] or '-' != value[7] or
+            value[10] not in 'T ' or ':' != value[13] or ':' != value[16]):
+        raise ValueError("'%s' is not an ISO 8601 date and time" % value)
+    microsecond = 0
+    offset = value[19:]
+    if offset[:1] in ('.', ','):
+        i = 1
+        while i < len(offset) and offset[i].isdigit():
+            i += 1
+        if 1 == i:
+            raise ValueError("'%s' has an empty fraction" % value)
+        microsecond = int(offset[1:i][:6].ljust(6, '0'))
+        offset = offset[i:]
+    minutes = 0
+    if offset in ('', 'Z', 'z'):
+        pass
+    elif offset[:1] in ('+', '-') and (
+            5 == len(offset) or (6 == len(offset) and ':' == offset[3])):
+        minutes = int(offset[1:3]) * 60 + int(offset[-2:])
+        if '-' == offset[0]:
+            minutes = -minutes
+    else:
+        raise ValueError("'%s' has an invalid UTC offset" % value)
+    dt = datetime(int(value[0:4]), int(value[5:7]), int(value[8:10]),
+                  int(value[11:13]), int(value[14:16]), int(value[17:19]),
+                  microsecond, _UTC)
+    if minutes:
+        dt -= timedelta(minutes=minutes)
+    return dt
+
+
 class DateTimeField(Field):
     field_type = datetime
     format = '%Y-%m-%dT%H:%M:%S'
@@ -80,15 +118,14 @@ class DateTimeField(Field):
     def coerce(cls, value):
         if not isinstance(value, cls.field_type):
             try:
-                return datetime.strptime(value[:-6], cls.format).replace(
-                    tzinfo=UTC())
-            except ValueError as e:
+                return _parse_datetime(value)
+            except (TypeError, ValueError) as e:
                 raise CoercionError(e)
         return value
 
     @classmethod
     def default(cls):
-        return datetime.utcnow().replace(tzinfo=UTC())
+        return datetime.utcnow().replace(tzinfo=_UTC)
 
 
 class DictField(Field):
@@ -18,47 +18,371 @@ limitations under the License.
 
 from __future__ import absolute_import
 
-__all__ = ['DataStore', 'LoadZone', 'Test', 'TestConfig', 'TestResult',
-           'UserScenario', 'UserScenarioValidation']
+__all__ = ['DataStore', 'IdentityMap', 'LoadZone', 'ResultKey', 'Test',
+           'TestConfig', 'TestResult', 'UserScenario',
+           'UserScenarioValidation']
 
 import json
 import hashlib
+import operator
 import sys
+import threading
+import weakref
 
+from collections import deque, namedtuple
+from datetime import datetime
+from itertools import product
 from .exceptions import CoercionError, ConflictError, ResponseParseError
 from .fields import (
     DataStoreListField, DateTimeField, DictField, Field, IntegerField,
     StringField, UnicodeField)
 from pprint import pformat
 from time import sleep
-from .utils import is_dict_different
+from .utils import (
+    BackgroundCall, LRUDict, UTC, lru_cache, map_concurrently,
+    with_metaclass)
 
 
-class Resource(object):
+_MISSING = object()
+
+# Placeholder for a field value to be set to the field default on access.
+_DEFAULT = object()
+
+
+def _snapshot(value):
+    """Get a comparable copy of a field value, to detect in place changes of
+    dicts and lists."""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, sort_keys=True)
+    return value
+
+
+class _Raw(object):
+    """Raw (uncoerced) field value, coerced on first access."""
+
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+
+def _field_spec(spec):
+    """Split a field declaration into field class and list of options."""
+    if isinstance(spec, tuple):
+        field_cls, options = spec
+        if isinstance(options, int):
+            options = [options]
+        return field_cls, list(options or [])
+    return spec, []
+
+
+class _Fields(dict):
+    """Field declarations of a resource class, installing a field attribute
+    on the class for every field added. Fields can only be added after class
+    creation to classes whose instances have a __dict__ to store them in,
+    not to slotted ones such as the built-in resources; subclass those
+    instead.
+
+    The declarations are compiled, once per change, into a flat schema of
+    (name, attribute, coercer, default factory, options) tuples.
+    """
+
+    owner = None
+
+    def __init__(self, *args, **kwargs):
+        super(_Fields, self).__init__(*args, **kwargs)
+        self._schema = None
+        self._entries = None
+
+    def __setitem__(self, name, spec):
+        if self.owner is not None:
+            self.owner._add_field(name)
+        super(_Fields, self).__setitem__(name, spec)
+        self._schema = None
+
+    def __delitem__(self, name):
+        super(_Fields, self).__delitem__(name)
+        self._schema = None
+
+    def update(self, *args, **kwargs):
+        for name, spec in dict(*args, **kwargs).items():
+            self[name] = spec
+
+    @property
+    def schema(self):
+        schema = self._schema
+        if schema is None:
+            schema = []
+            for name, spec in self.items():
+                field_cls, options = _field_spec(spec)
+                schema.append((name, '_f_%s' % name, field_cls.coerce,
+                               field_cls.default, frozenset(options)))
+            self._entries = dict([(e[0], e) for e in schema])
+            self._schema = schema
+        return schema
+
+    def entry(self, name):
+        """Get schema entry of a field."""
+        if self._schema is None:
+            self.schema
+        return self._entries[name]
+
+
+class _FieldAttribute(object):
+    """Resource attribute of a field, storing the coerced value in the
+    instance attribute (or slot) '_f_<name>'.
+
+    Defaults, and raw values of lazily populated resources, are only
+    computed respectively coerced on first access, the result replacing the
+    stored placeholder.
+    """
+
+    __slots__ = ('name', 'attr')
+
+    def __init__(self, name):
+        self.name = name
+        self.attr = '_f_%s' % name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        try:
+            value = getattr(instance, self.attr)
+        except AttributeError:
+            raise AttributeError("'%s' object has no field '%s'"
+                                 % (owner.__name__, self.name))
+        if value is _DEFAULT or value.__class__ is _Raw:
+            value = instance._resolve_field(self.name, self.attr, value)
+        return value
+
+    def __set__(self, instance, value):
+        coerce = instance.__class__.fields.entry(self.name)[2]
+        try:
+            value = coerce(value)
+        except CoercionError as e:
+            raise ValueError(e)
+        object.__setattr__(instance, self.attr, value)
+        if instance._changed is None:
+            instance._changed = set()
+        instance._changed.add(self.name)
+
+
+class _ResourceMeta(type):
+    """Metaclass of resources.
+
+    Field values are stored directly on instances, while field metadata is
+    only held by the class. Classes declaring `__slots__` get a slot per
+    field declared in their body on top of the declared ones, and are
+    compact as long as all their bases are slotted too.
+    """
+
+    def __new__(mcs, name, bases, namespace):
+        fields = namespace.get('fields')
+        if fields is not None:
+            fields = namespace['fields'] = _Fields(fields)
+            if '__slots__' in namespace:
+                slots = namespace['__slots__']
+                if isinstance(slots, str):
+                    slots = (slots,)
+                namespace['__slots__'] = tuple(slots) + tuple(
+                    '_f_%s' % k for k in sorted(fields))
+        cls = super(_ResourceMeta, mcs).__new__(mcs, name, bases, namespace)
+        if fields is not None:
+            fields.owner = cls
+            for k in fields:
+                cls._add_field(k)
+        return cls
+
+    def _add_field(cls, name):
+        if not hasattr(cls, '_f_%s' % name) and \
+                not any('__dict__' in c.__dict__ for c in cls.__mro__):
+            raise TypeError("Can't add field '%s' to slotted resource class "
+                            "'%s', declare it in a subclass instead"
+                            % (name, cls.__name__))
+        if not isinstance(cls.__dict__.get(name), _FieldAttribute):
+            setattr(cls, name, _FieldAttribute(name))
+
+
+# Lookups of list() filters, by keyword suffix.
+_FILTER_LOOKUPS = {
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'lt': operator.lt,
+    'lte': operator.le,
+    'contains': operator.contains
+}
+
+
+def _filter_value(coerce, value):
+    try:
+        value = coerce(value)
+    except CoercionError as e:
+        raise ValueError(e)
+    if isinstance(value, datetime) and value.tzinfo is None:
+        value = value.replace(tzinfo=UTC())
+    return value
+
+
+def _param_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _compile_filters(fields, filters):
+    """Compile list() filters into query string parameters and predicates
+    of (field name, coercer, test, value) to match raw data with.
+
+    Raises:
+        ValueError: Unknown field or lookup, or invalid filter value.
+    """
+    params = {}
+    predicates = []
+    for key, value in filters.items():
+        name, _, lookup = key.partition('__')
+        if name not in fields:
+            raise ValueError("Unknown filter field '%s'" % name)
+        coerce = fields.entry(name)[2]
+        if lookup:
+            if lookup not in _FILTER_LOOKUPS:
+                raise ValueError("Unknown filter lookup '%s'" % lookup)
+            test = _FILTER_LOOKUPS[lookup]
+            if 'contains' != lookup:
+                value = _filter_value(coerce, value)
+            params[key] = _param_value(value)
+        elif isinstance(value, (list, tuple, set, frozenset)):
+            value = [_filter_value(coerce, v) for v in value]
+            test = lambda a, b: a in b
+            params[key] = ','.join(['%s' % _param_value(v) for v in value])
+        else:
+            value = _filter_value(coerce, value)
+            test = operator.eq
+            params[key] = _param_value(value)
+        predicates.append((name, coerce, test, value))
+    return params, predicates
+
+
+def _matches(data, predicates):
+    """Check whether raw resource data matches all filter predicates.
+    Fields missing from data (not selected) are not checked, null fields
+    never match.
+
+    Raises:
+        CoercionError: Unable to coerce a field value.
+    """
+    for name, coerce, test, value in predicates:
+        raw = data.get(name, _MISSING)
+        if raw is _MISSING:
+            continue
+        if raw is None or not test(coerce(raw), value):
+            return False
+    return True
+
+
+class IdentityMap(object):
+    """Map of (resource class, resource ID) to the one resource instance
+    representing that resource, see Client(identity_map=True).
+
+    Resources loaded from the API through a client with an identity map are
+    looked up in it, fresh data being merged into the existing instance
+    instead of creating another one. Fields with local changes not updated
+    in the API yet (see Resource.changed_fields()) are left as they are by
+    merges, so that loading a resource anywhere doesn't discard pending
+    edits. Instances are only weakly referenced, and dropped from the map
+    once no longer used elsewhere.
+
+    Resource IDs are coerced by the ID field of the resource class, so that
+    e.g. '5' and 5 refer to the same resource.
+    """
+
+    def __init__(self):
+        self._instances = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        return self._key(*key) in self._instances
+
+    def __len__(self):
+        return len(self._instances)
+
+    @staticmethod
+    def _key(cls, resource_id):
+        try:
+            resource_id = cls.fields.entry('id')[2](resource_id)
+        except (KeyError, CoercionError, TypeError):
+            pass
+        return (cls, resource_id)
+
+    def get(self, cls, resource_id):
+        """Get the instance of a resource, or None if not in the map."""
+        return self._instances.get(self.__class__._key(cls, resource_id))
+
+    def load(self, cls, client, data, lazy=False, partial=False):
+        """Get the instance of the resource described by data, merging data
+        into the instance in the map or adding a new one.
+
+        Args:
+            cls: Resource class.
+            client: API client instance.
+            data: Dict of field name to raw value, e.g. an API response.
+            lazy: Whether to coerce field values on first access, see
+                Resource._set_fields().
+            partial: Whether data only holds some of the fields, see
+                Resource._set_fields().
+
+        Returns:
+            Resource instance.
+        """
+        resource_id = data.get('id')
+        if resource_id is None:
+            instance = cls(client)
+            instance._set_fields(data, lazy=lazy, partial=partial)
+            return instance
+        key = self.__class__._key(cls, resource_id)
+        with self._lock:
+            instance = self._instances.get(key)
+            keep = None
+            if instance is None:
+                instance = cls(client)
+                self._instances[key] = instance
+            else:
+                keep = set(instance.changed_fields())
+                keep.update(instance._changed or ())
+            instance._set_fields(data, lazy=lazy, partial=partial,
+                                 keep=keep)
+        return instance
+
+    def discard(self, cls, resource_id):
+        """Drop a resource from the map, e.g. when deleted."""
+        with self._lock:
+            self._instances.pop(self.__class__._key(cls, resource_id), None)
+
+    def clear(self):
+        with self._lock:
+            self._instances.clear()
+
+
+class Resource(with_metaclass(_ResourceMeta, object)):
     """All API resources derive from this base class."""
 
+    __slots__ = ('client', '_changed', '_synced', '_unloaded', '__weakref__')
+
     fields = {}
 
     def __init__(self, client, **kwargs):
-        super(Resource, self).__setattr__('_fields', {})
         self.client = client
-        self._set_fields(kwargs)
+        self._changed = None
+        self._synced = None
+        self._unloaded = None
+        self._set_fields(kwargs, synced=False)
 
     def __getattr__(self, name):
-        fields = self.__class__.fields
-        if name in fields:
-            return self._fields[name].value
         raise AttributeError("'%s' object has no field '%s'"
                              % (self.__class__.__name__, name))
 
-    def __setattr__(self, name, value):
-        fields = self.__class__.fields
-        if name in fields:
-            self._fields[name].value = value
-        super(Resource, self).__setattr__(name, value)
-
     def __repr__(self):
-        return "<%s>\n%s" % (self.__class__.__name__, pformat(self._fields))
+        values = dict([(k, getattr(self, k)) for k in self.__class__.fields])
+        return "<%s>\n%s" % (self.__class__.__name__, pformat(values))
 
     @classmethod
     def _path(cls, resource_id=None, action=None):
@@ -69,24 +393,186 @@ class Resource(object):
             return '%s/%s' % (cls.resource_name, str(resource_id))
         return cls.resource_name
 
-    def _set_fields(self, data):
-        fields = self.__class__.fields
-        for k, f in fields.items():
-            if isinstance(f, tuple):
-                fun, opts = f
-                self._fields[k] = fun(data.get(k, fun.default()), options=opts)
+    @classmethod
+    def _load(cls, client, data, lazy=False, fields=None):
+        """Create a resource instance from API response data, or merge the
+        data into the existing instance if the client has an identity map.
+        Only the given fields are populated if any."""
+        partial = fields is not None
+        if partial:
+            data = dict([(k, data[k]) for k in fields if k in data])
+        identity_map = getattr(client, 'identity_map', None)
+        if identity_map is not None:
+            return identity_map.load(cls, client, data, lazy=lazy,
+                                     partial=partial)
+        instance = cls(client)
+        instance._set_fields(data, lazy=lazy, partial=partial)
+        return instance
+
+    def unloaded_fields(self):
+        """Get names of fields not populated from the API, as the resource
+        was only loaded with a field selection. Their values are defaults
+        rather than the state of the resource in the API."""
+        return sorted(self._unloaded or ())
+
+    @classmethod
+    def _selected_fields(cls, fields):
+        """Validate a field selection, always including the ID.
+
+        Raises:
+            ValueError: Unknown field.
+        """
+        fields = list(fields)
+        for name in fields:
+            if name not in cls.fields:
+                raise ValueError("'%s' has no field '%s'"
+                                 % (cls.__name__, name))
+        if 'id' in cls.fields and 'id' not in fields:
+            fields.insert(0, 'id')
+        return fields
+
+    def changed_fields(self):
+        """Get names of serialized fields changed since the resource was last
+        populated from the API, by assignment or by in place modification.
+
+        All serialized fields count as changed for resources that have not
+        been populated from the API.
+        """
+        synced = self._synced
+        changed = self._changed or ()
+        names = []
+        for name, attr, _, _, options in self.__class__.fields.schema:
+            if Field.SERIALIZE not in options:
+                continue
+            if synced is None:
+                names.append(name)
+            elif name in synced:
+                if _snapshot(getattr(self, name)) != synced[name]:
+                    names.append(name)
+            elif name in changed:
+                names.append(name)
+        return names
+
+    def validate_fields(self):
+        """Coerce all field values not coerced yet, see _set_fields().
+
+        Raises:
+            ResponseParseError: A field value could not be coerced.
+        """
+        for name in self.__class__.fields:
+            getattr(self, name)
+
+    def _resolve_field(self, name, attr, value):
+        _, _, coerce, default, options = self.__class__.fields.entry(name)
+        if value is _DEFAULT:
+            value = default()
+        else:
+            try:
+                value = coerce(value.value)
+            except CoercionError as e:
+                raise ResponseParseError(e)
+        object.__setattr__(self, attr, value)
+        if self._synced is not None and Field.SERIALIZE in options:
+            self._synced[name] = _snapshot(value)
+        return value
+
+    def _set_fields(self, data, lazy=False, synced=True, partial=False,
+                    keep=None):
+        """Populate fields from data, e.g. an API response.
+
+        Fields assigned locally keep their value unless present in data.
+        Missing or null fields are set to their defaults on first access.
+        Serialized fields populated are snapshotted to detect later changes,
+        see changed_fields().
+
+        Args:
+            data: Dict of field name to raw value.
+            lazy: Whether to store raw values and coerce them on first
+                access (raising ResponseParseError on failure) instead of
+                right away (raising CoercionError).
+            synced: Whether data is the state of the resource in the API,
+                rather than set locally.
+            partial: Whether data only holds some of the fields, leaving
+                missing fields as they are. Fields never populated from the
+                API are tracked, see unloaded_fields().
+            keep: Optional set of names of fields to leave as they are.
+        """
+        changed = self._changed
+        snapshots = None
+        if synced:
+            if partial:
+                unloaded = self._unloaded
+                if self._synced is None:
+                    unloaded = set(self.__class__.fields)
+                if unloaded:
+                    unloaded.difference_update(data)
+                self._unloaded = unloaded or None
             else:
-                self._fields[k] = f(data.get(k, f.default()))
+                self._unloaded = None
+            snapshots = self._synced
+            if snapshots is None:
+                snapshots = self._synced = {}
+        serialize = Field.SERIALIZE
+        setattr_ = object.__setattr__
+        for name, attr, coerce, _, options in self.__class__.fields.schema:
+            if keep and name in keep:
+                continue
+            value = data.get(name, _MISSING)
+            if value is _MISSING:
+                if partial or (changed and name in changed):
+                    continue
+                value = _DEFAULT
+            elif value is None:
+                value = _DEFAULT
+            elif lazy:
+                value = _Raw(value)
+            else:
+                value = coerce(value)
+            if changed:
+                changed.discard(name)
+            setattr_(self, attr, value)
+            if snapshots is not None and serialize in options:
+                if value is _DEFAULT or value.__class__ is _Raw:
+                    # Not exposed yet, snapshotted on first access.
+                    snapshots.pop(name, None)
+                else:
+                    snapshots[name] = _snapshot(value)
 
 
 class GetMixin(object):
+    __slots__ = ()
+
+    # Query string parameter of field selection.
+    fields_param = 'fields'
+
     @classmethod
-    def get(cls, client, resource_id):
-        response = client.get(cls._path(resource_id))
+    def get(cls, client, resource_id, lazy=False, fields=None):
+        """Get a resource.
+
+        Args:
+            client: API client instance.
+            resource_id: ID of resource.
+            lazy: Whether to coerce field values on first access, see
+                Resource._set_fields().
+            fields: Optional list of names of fields to get, other fields
+                keeping their defaults (or current values when merged into
+                an instance of an identity map).
+
+        Returns:
+            Resource instance.
+
+        Raises:
+            ResponseParseError: Unable to parse response from API.
+            ValueError: Unknown field.
+        """
+        params = None
+        if fields is not None:
+            fields = cls._selected_fields(fields)
+            params = {cls.fields_param: ','.join(fields)}
+        response = client.get(cls._path(resource_id), params=params)
         try:
-            instance = cls(client)
-            instance._set_fields(response.json())
-            return instance
+            return cls._load(client, response.json(), lazy=lazy,
+                             fields=fields)
         except CoercionError as e:
             raise ResponseParseError(e)
 
@@ -99,6 +585,8 @@ class GetMixin(object):
 
 
 class CreateMixin(object):
+    __slots__ = ()
+
     create_content_type = 'application/json'
 
     @classmethod
@@ -110,64 +598,204 @@ class CreateMixin(object):
         response = client.post(cls._path(), headers=headers, data=data,
                                file_object=file_object)
         try:
-            instance = cls(client)
-            instance._set_fields(response.json())
-            return instance
+            return cls._load(client, response.json())
         except CoercionError as e:
             raise ResponseParseError(e)
 
 
 class DeleteMixin(object):
+    __slots__ = ()
+
     def delete(self):
-        self.client.delete(self.__class__._path(resource_id=self.id))
+        self.__class__.delete_with_id(self.client, self.id)
 
     @classmethod
     def delete_with_id(cls, client, resource_id):
         client.delete(cls._path(resource_id=resource_id))
+        identity_map = getattr(client, 'identity_map', None)
+        if identity_map is not None:
+            identity_map.discard(cls, resource_id)
 
 
 class UpdateMixin(object):
+    __slots__ = ()
+
     update_content_type = 'application/json'
 
+    # Whether the API accepts updates of a subset of the serialized fields.
+    # Only enable for resources whose update endpoint is known to leave
+    # omitted fields as they are.
+    update_partial = False
+
     def update(self, data=None):
+        """Update the resource, sending all serialized fields if any changed
+        since it was last populated from the API (see changed_fields()), or
+        only the changed ones if the resource sets update_partial.
+
+        Fields not loaded from the API (see unloaded_fields()) are never
+        sent unless assigned, to not overwrite their state in the API with
+        defaults.
+
+        No request is made if nothing changed.
+
+        Args:
+            data: Optional dict (or JSON string) of field values to assign
+                before updating.
+        """
         if data:
             if isinstance(data, str):
                 data = json.loads(data)
-            self._set_fields(data)
+            fields = self.__class__.fields
+            for name, value in data.items():
+                if name in fields:
+                    setattr(self, name, value)
+
+        names = self.changed_fields()
+        if not names:
+            return
+        if not self.__class__.update_partial:
+            unloaded = set(self._unloaded or ()).difference(names)
+            names = [name for name, _, _, _, options
+                     in self.__class__.fields.schema
+                     if Field.SERIALIZE in options and name not in unloaded]
 
         headers = {'Content-Type': self.__class__.update_content_type}
-        data = {}
-        fields = self.__class__.fields
-        for k, f in fields.items():
-            if self._fields[k].has_option(Field.SERIALIZE):
-                data[k] = getattr(self, k)
-
+        data = dict([(name, getattr(self, name)) for name in names])
         response = self.client.put(self.__class__._path(resource_id=self.id),
                                    headers=headers, data=json.dumps(data))
         try:
             self._set_fields(response.json())
         except CoercionError as e:
             raise ResponseParseError(e)
+        changed = self._changed or set()
+        for name in names:
+            changed.discard(name)
+            self._synced[name] = _snapshot(getattr(self, name))
 
 
 class ListMixin(object):
+    __slots__ = ()
+
+    # Query string parameters of the page number, page size and field
+    # selection.
+    page_param = 'page'
+    page_size_param = 'page_size'
+    fields_param = 'fields'
+
     @classmethod
-    def list(cls, client):
-        response = client.get(cls._path())
+    def list(cls, client, lazy=False, page_size=None, page=1, limit=None,
+             prefetch=True, fields=None, **filters):
+        """List resources.
+
+        Filters are keyword arguments named after a field, optionally
+        followed by a lookup: 'status=2' or 'status=[1, 2]' (any of),
+        'created__gte=datetime(2015, 12, 1)' ('gt', 'gte', 'lt' and 'lte'
+        ranges) and 'name__contains="nightly"'. They are sent as query
+        string parameters, and also applied to the response in case the API
+        ignored them. Naive datetimes are taken to be in UTC.
+
+        Args:
+            client: API client instance.
+            lazy: Whether to coerce field values on first access, see
+                Resource._set_fields().
+            page_size: Number of resources to request per page. If set, an
+                iterator fetching pages as it is consumed is returned
+                instead of a list of all resources.
+            page: Number of first page to fetch when paginating, from 1.
+            limit: Maximum number of resources to iterate when paginating.
+            prefetch: Whether to fetch the next page in the background while
+                iterating the current one when paginating.
+            fields: Optional list of names of fields to get, see
+                GetMixin.get(). Fields filtered on are always selected.
+            filters: Field filters, see above.
+
+        Returns:
+            List of resource instances, or iterator of resource instances if
+            page_size is set.
+
+        Raises:
+            ResponseParseError: Unable to parse response from API.
+            ValueError: Unknown field or lookup, or invalid filter value.
+        """
+        params, predicates = _compile_filters(cls.fields, filters)
+        if fields is not None:
+            # Select filtered fields too, to apply filters locally.
+            fields = list(fields)
+            fields.extend(name for name, _, _, _ in predicates
+                          if name not in fields)
+            fields = cls._selected_fields(fields)
+            params[cls.fields_param] = ','.join(fields)
+
+        def load(data):
+            if predicates and not _matches(data, predicates):
+                return None
+            return cls._load(client, data, lazy=lazy, fields=fields)
+
+        if page_size is not None:
+            return cls._iter_pages(client, load, params, page_size, page,
+                                   limit, prefetch)
+        response = client.get(cls._path(), params=params or None)
         try:
             resources = []
             l = response.json()
             if isinstance(l, list):
                 for r in l:
-                    instance = cls(client)
-                    instance._set_fields(r)
-                    resources.append(instance)
+                    instance = load(r)
+                    if instance is not None:
+                        resources.append(instance)
             return resources
         except CoercionError as e:
             raise ResponseParseError(e)
 
+    @classmethod
+    def _iter_pages(cls, client, load, params, page_size, page, limit,
+                    prefetch):
+        """Iterate resources page by page, see list().
+
+        Pages are only requested as the iteration reaches them, with at
+        most one page requested ahead, so that stopping early costs no
+        further requests. Iteration stops at the first page that is short
+        or repeats the previous one, i.e. if the API ignores pagination.
+        """
+        def fetch(page):
+            page_params = dict(params)
+            page_params[cls.page_param] = page
+            page_params[cls.page_size_param] = page_size
+            return client.get(cls._path(), params=page_params).json()
+
+        def first_id(data):
+            return data[0].get('id') if data else None
+
+        count = 0
+        previous_id = None
+        data = fetch(page)
+        while isinstance(data, list) and data:
+            if previous_id is not None and first_id(data) == previous_id:
+                return
+            previous_id = first_id(data)
+            last = len(data) != page_size
+            pending = None
+            if prefetch and not last and (limit is None or
+                                          count + len(data) < limit):
+                pending = BackgroundCall(fetch, page + 1)
+            for r in data:
+                if limit is not None and count >= limit:
+                    return
+                try:
+                    instance = load(r)
+                except CoercionError as e:
+                    raise ResponseParseError(e)
+                if instance is not None:
+                    count += 1
+                    yield instance
+            if last or (limit is not None and count >= limit):
+                return
+            page += 1
+            data = pending.result() if pending is not None else fetch(page)
+
 
 class DataStore(Resource, ListMixin, GetMixin, CreateMixin, DeleteMixin):
+    __slots__ = ()
     resource_name = 'data-stores'
     fields = {
         'id': IntegerField,
@@ -215,6 +843,7 @@ class DataStore(Resource, ListMixin, GetMixin, CreateMixin, DeleteMixin):
 
 
 class LoadZone(Resource, ListMixin):
+    __slots__ = ()
     resource_name = 'load-zones'
     fields = {
         'id': UnicodeField,
@@ -268,6 +897,11 @@ class LoadZone(Resource, ListMixin):
             raise ValueError("There's no load zone with name '%s'" % name)
 
 
+ResultKey = namedtuple('ResultKey', [
+    'kind', 'metric', 'name_hash', 'name', 'load_zone_id', 'user_scenario_id',
+    'status_code', 'method'])
+
+
 class TestResult(object):
     ACCUMULATED_LOAD_TIME = '__li_accumulated_load_time'
     ACTIVE_USERS = '__li_clients_active'
@@ -288,6 +922,45 @@ class TestResult(object):
     USER_SCENARIO_REPETITION_SUCCESS_RATE = '__li_reps_succeeded_percent'
     USER_SCENARIO_REPETITION_FAILURE_RATE = '__li_reps_failed_percent'
 
+    # Result data point timestamps are in microseconds.
+    TIMESTAMP_RESOLUTION = 1000000
+
+    # Kinds of results with hashed names, and their result ID prefixes.
+    HASHED_PREFIXES = (
+        ('url', '__li_url_'),
+        ('page', '__li_page_'),
+        ('custom', '__custom_')
+    )
+
+    @classmethod
+    def parse_result_id(cls, result_id):
+        """Parse a result ID string into its parts.
+
+        Parsing is memoized, making it cheap to call in aggregation loops.
+
+        Args:
+            result_id: Result ID string, e.g. '__li_url_<md5>:13:42:200:GET'.
+
+        Returns:
+            ResultKey with the kind of result ('standard', 'url', 'page' or
+            'custom'), the metric name (the prefix for hashed results), the
+            name hash and original name (if hashed and known), load zone ID,
+            user scenario ID, status code and method. Parts not present in the
+            result ID are None.
+        """
+        key = _parse_result_id(result_id)
+        if key.name_hash is not None:
+            name = _digest_names.get(key.name_hash)
+            if name is not None:
+                key = key._replace(name=name)
+        return key
+
+    @classmethod
+    def register_name(cls, name):
+        """Make the original name of a page, URL or custom metric known, so
+        that parse_result_id() can resolve it from its hash."""
+        _remember_name(_name_digest(name), name)
+
     @classmethod
     def result_id_from_name(cls, name, load_zone_id=None, user_scenario_id=None):
         if not load_zone_id:
@@ -299,37 +972,115 @@ class TestResult(object):
     @classmethod
     def result_id_from_custom_metric_name(cls, custom_name, load_zone_id,
                                           user_scenario_id):
-        if sys.version_info >= (3, 0):
-            custom_name = custom_name.encode('utf-8')
-        else:
-            if isinstance(custom_name, unicode):
-                custom_name = custom_name.encode('utf-8')
-        return '__custom_%s:%s:%s' % (hashlib.md5(custom_name).hexdigest(),
+        return '__custom_%s:%s:%s' % (_name_digest(custom_name),
                                       str(load_zone_id), str(user_scenario_id))
 
     @classmethod
     def result_id_for_page(cls, page_name, load_zone_id, user_scenario_id):
-        if sys.version_info >= (3, 0):
-            page_name = page_name.encode('utf-8')
-        else:
-            if isinstance(page_name, unicode):
-                page_name = page_name.encode('utf-8')
-        return '__li_page_%s:%s:%s' % (hashlib.md5(page_name).hexdigest(),
+        return '__li_page_%s:%s:%s' % (_name_digest(page_name),
                                        str(load_zone_id), str(user_scenario_id))
 
     @classmethod
     def result_id_for_url(cls, url, load_zone_id, user_scenario_id,
                           method='GET', status_code=200):
-        if sys.version_info >= (3, 0):
-            url = url.encode('utf-8')
-        else:
-            if isinstance(url, unicode):
-                url = url.encode('utf-8')
-        return '__li_url_%s:%s:%s:%s:%s' % (hashlib.md5(url).hexdigest(),
+        return '__li_url_%s:%s:%s:%s:%s' % (_name_digest(url),
                                             str(load_zone_id),
                                             str(user_scenario_id),
                                             str(status_code), method)
 
+    @classmethod
+    def result_ids_from_custom_metric_names(cls, custom_names, load_zone_ids,
+                                            user_scenario_ids):
+        """Build result IDs for every combination of custom metric name, load
+        zone and user scenario, hashing each name only once.
+
+        Returns:
+            List of result IDs.
+        """
+        return _result_id_matrix('__custom_', custom_names, load_zone_ids,
+                                 user_scenario_ids)
+
+    @classmethod
+    def result_ids_for_pages(cls, page_names, load_zone_ids,
+                             user_scenario_ids):
+        """Build result IDs for every combination of page name, load zone and
+        user scenario, hashing each name only once.
+
+        Returns:
+            List of result IDs.
+        """
+        return _result_id_matrix('__li_page_', page_names, load_zone_ids,
+                                 user_scenario_ids)
+
+    @classmethod
+    def result_ids_for_urls(cls, urls, load_zone_ids, user_scenario_ids,
+                            methods=('GET',), status_codes=(200,)):
+        """Build result IDs for every combination of URL, load zone, user
+        scenario, status code and method, hashing each URL only once.
+
+        Returns:
+            List of result IDs.
+        """
+        return _result_id_matrix('__li_url_', urls, load_zone_ids,
+                                 user_scenario_ids, status_codes, methods)
+
+
+# Original names of the most recently hashed (or registered) page, URL and
+# custom metric names, by digest.
+_DIGEST_NAMES_MAXSIZE = 65536
+_digest_names = LRUDict(_DIGEST_NAMES_MAXSIZE)
+_digest_names_lock = threading.Lock()
+
+
+def _remember_name(digest, name):
+    with _digest_names_lock:
+        _digest_names[digest] = name
+
+
+@lru_cache(maxsize=65536)
+def _name_digest(name):
+    """MD5 hex digest of a page, URL or custom metric name, as used in result
+    IDs. Memoized, as large numbers of IDs are built from few names."""
+    encoded = name
+    if sys.version_info >= (3, 0):
+        encoded = name.encode('utf-8')
+    else:
+        if isinstance(name, unicode):
+            encoded = name.encode('utf-8')
+    digest = hashlib.md5(encoded).hexdigest()
+    _remember_name(digest, name)
+    return digest
+
+
+@lru_cache(maxsize=65536)
+def _parse_result_id(result_id):
+    parts = result_id.split(':')
+    name = parts[0]
+    for kind, prefix in TestResult.HASHED_PREFIXES:
+        if name.startswith(prefix) and len(name) == len(prefix) + 32:
+            metric, name_hash = prefix, name[len(prefix):]
+            break
+    else:
+        kind, metric, name_hash = 'standard', name, None
+    ints = []
+    for part in parts[1:4]:
+        try:
+            ints.append(int(part))
+        except ValueError:
+            ints.append(part)
+    ints.extend([None] * (3 - len(ints)))
+    method = parts[4] if 4 < len(parts) else None
+    return ResultKey(kind, metric, name_hash, None, ints[0], ints[1], ints[2],
+                     method)
+
+
+def _result_id_matrix(prefix, names, *dimensions):
+    """Build result IDs for the cartesian product of names and dimensions."""
+    suffixes = [':'.join(str(d) for d in combination)
+                for combination in product(*dimensions)]
+    return ['%s%s:%s' % (prefix, _name_digest(name), suffix)
+            for name in names for suffix in suffixes]
+
 
 class _TestResultStream(Resource):
     resource_name = 'tests'
@@ -338,16 +1089,51 @@ class _TestResultStream(Resource):
         self.test = test
         self.result_ids = result_ids
         self._last = dict([(rid, {'offset': -1}) for rid in result_ids])
-        self._last_two = []
+        self._watermarks = dict([(rid, -1) for rid in result_ids])
+        self._duplicates = dict([(rid, 0) for rid in result_ids])
+        self._polls = 0
+        self._progress = 0
+        self._progress_poll = 0
         self._series = {}
+        self._consumers = []
 
     @property
     def series(self):
         return self._series
 
+    @property
+    def progress(self):
+        """Monotonic counter of polls that advanced any result's offset."""
+        return self._progress
+
+    @property
+    def watermarks(self):
+        """Dict of result ID to highest offset received so far."""
+        return self._watermarks
+
+    @property
+    def duplicates(self):
+        """Dict of result ID to number of data points dropped for having an
+        offset already received."""
+        return self._duplicates
+
+    def attach(self, consumer):
+        """Attach a consumer to this stream.
+
+        Args:
+            consumer: Result consumer (e.g. a result store) to feed every batch
+                of new data points ingested by this stream.
+
+        Returns:
+            The attached consumer.
+        """
+        self._consumers.append(consumer)
+        return consumer
+
     def __call__(self, poll_rate=3, post_polls=5):
         def is_done(self):
-            if not self.test.is_done() or not self.is_done():
+            # Only sync the test once data has stopped advancing.
+            if not self.is_done() or not self.test.is_done():
                 return False
             return True
 
@@ -356,51 +1142,80 @@ class _TestResultStream(Resource):
             done = is_done(self)
             if done:
                 post_polls = post_polls - 1
-            q = ['%s|%d' % (rid, self._last.get(rid, {}).get('offset', -1))
+            q = ['%s|%d' % (rid, self._watermarks.get(rid, -1))
                  for rid in self.result_ids]
             path = self.__class__._path(
                 resource_id=self.test.id, action='results')
             response = self._get(path, {'ids': ','.join(q)})
             results = response.json()
             change = {}
+            batch = {}
             for rid, data in results.items():
+                if rid not in self._watermarks or not data:
+                    continue
                 try:
-                    if data[0]['offset'] > self._last[rid]['offset']:
-                        change[rid] = data[-1]
-                        self._last[rid] = data[-1]
-                except (IndexError, KeyError):
+                    data = self._dedup(rid, data)
+                except KeyError:
+                    continue
+                if not data:
                     continue
+                change[rid] = data[-1]
+                self._last[rid] = data[-1]
                 if rid not in self._series:
                     self._series[rid] = []
                 self._series[rid].extend(data)
+                batch[rid] = data
 
-            if 2 == len(self._last_two):
-                self._last_two.pop(0)
-            self._last_two.append(self._last)
+            if batch:
+                for consumer in self._consumers:
+                    consumer.consume(self, batch)
+            self._polls += 1
             if change:
+                self._progress += 1
+                self._progress_poll = self._polls
                 yield change
             sleep(poll_rate)
 
+        for consumer in self._consumers:
+            consumer.finish(self)
+
     def __iter__(self):
         return self.__call__()
 
     def is_done(self):
-        if 2 != len(self._last_two):
-            return False
-        if is_dict_different(self._last_two[0], self._last_two[1]):
-            return False
-        return True
+        """Check whether data has stopped advancing, i.e. whether the last
+        poll didn't move any result's offset forward.
+
+        Returns:
+            True if the stream is idle, otherwise False.
+        """
+        return self._progress_poll < self._polls
 
     def last(self, result_id=None):
         if not result_id:
             return self._last
         return self._last[result_id]
 
+    def _dedup(self, rid, data):
+        """Drop data points at or below the result's watermark, keeping the
+        ingested series strictly increasing by offset."""
+        watermark = self._watermarks[rid]
+        fresh = []
+        for point in data:
+            offset = point['offset']
+            if offset > watermark:
+                fresh.append(point)
+                watermark = offset
+        self._duplicates[rid] += len(data) - len(fresh)
+        self._watermarks[rid] = watermark
+        return fresh
+
     def _get(self, path, params):
         return self.test.client.get(path, params=params)
 
 
 class Test(Resource, ListMixin, GetMixin, CreateMixin, DeleteMixin):
+    __slots__ = ()
     resource_name = 'tests'
     fields = {
         'id': IntegerField,
@@ -440,6 +1255,42 @@ class Test(Resource, ListMixin, GetMixin, CreateMixin, DeleteMixin):
             return False
         return True
 
+    def fetch_results(self, result_ids, offsets=None, max_workers=4):
+        """Fetch complete series of results in one go, without polling.
+
+        Meant for finished tests. Result IDs are split across a bounded pool
+        of worker threads, each paginating by offset until the API has no
+        more data for its result.
+
+        Args:
+            result_ids: List of result IDs to fetch.
+            offsets: Dict of result ID to offset to fetch data points after,
+                defaults to fetching all data points.
+            max_workers: Maximum number of concurrent requests.
+
+        Returns:
+            Dict of result ID to list of data points.
+        """
+        offsets = offsets or {}
+        path = self.__class__._path(resource_id=self.id, action='results')
+
+        def fetch(rid):
+            offset = offsets.get(rid, -1)
+            series = []
+            while True:
+                response = self.client.get(
+                    path, params={'ids': '%s|%d' % (rid, offset)})
+                data = [p for p in response.json().get(rid) or []
+                        if p['offset'] > offset]
+                if not data:
+                    return series
+                series.extend(data)
+                offset = data[-1]['offset']
+
+        result_ids = list(result_ids)
+        return dict(zip(result_ids, map_concurrently(fetch, result_ids,
+                                                     max_workers=max_workers)))
+
     def is_done(self):
         """Check whether test is done or not.
 
@@ -456,6 +1307,34 @@ class Test(Resource, ListMixin, GetMixin, CreateMixin, DeleteMixin):
             return True
         return False
 
+    def result_ids(self):
+        """List result IDs available for this test.
+
+        Returns:
+            List of dicts with 'id' and 'name' keys, name being the original
+            (unhashed) name of page, URL and custom metric results where the
+            API provides it, otherwise None.
+
+        Raises:
+            ResponseParseError: Unable to parse response from API.
+        """
+        response = self.client.get(
+            self.__class__._path(resource_id=self.id, action='result_ids'))
+        result_ids = []
+        try:
+            data = response.json()
+            if isinstance(data, dict):
+                data = [rid for rids in data.values() for rid in rids]
+            for rid in data:
+                if isinstance(rid, dict):
+                    result_ids.append({'id': rid['id'],
+                                       'name': rid.get('name')})
+                else:
+                    result_ids.append({'id': rid, 'name': None})
+        except (AttributeError, KeyError, TypeError) as e:
+            raise ResponseParseError(e)
+        return result_ids
+
     def result_stream(self, result_ids=None):
         """Get access to result stream.
 
@@ -503,6 +1382,7 @@ class Test(Resource, ListMixin, GetMixin, CreateMixin, DeleteMixin):
 
 class TestConfig(Resource, ListMixin, GetMixin, CreateMixin, DeleteMixin,
                  UpdateMixin):
+    __slots__ = ()
     resource_name = 'test-configs'
     fields = {
         'id': IntegerField,
@@ -575,9 +1455,7 @@ class TestConfig(Resource, ListMixin, GetMixin, CreateMixin, DeleteMixin,
             self.__class__._path(resource_id=self.id, action='clone'),
             headers=headers, data={'name': name})
         try:
-            instance = self.__class__(self.client)
-            instance._set_fields(response.json())
-            return instance
+            return self.__class__._load(self.client, response.json())
         except CoercionError as e:
             raise ResponseParseError(e)
 
@@ -630,6 +1508,7 @@ class TestConfig(Resource, ListMixin, GetMixin, CreateMixin, DeleteMixin,
 
 class UserScenario(Resource, ListMixin, GetMixin, CreateMixin, DeleteMixin,
                    UpdateMixin):
+    __slots__ = ()
     resource_name = 'user-scenarios'
     fields = {
         'id': IntegerField,
@@ -647,51 +1526,138 @@ class UserScenario(Resource, ListMixin, GetMixin, CreateMixin, DeleteMixin,
             self.__class__._path(resource_id=self.id, action='clone'),
             headers=headers, data={'name': name})
         try:
-            instance = self.__class__(self.client)
-            instance._set_fields(response.json())
-            return instance
+            return self.__class__._load(self.client, response.json())
         except CoercionError as e:
             raise ResponseParseError(e)
 
-    def validate(self):
-        return self.client.create_user_scenario_validation(
+    def validate(self, cache=None):
+        """Start validation of this user scenario.
+
+        Args:
+            cache: Optional validation cache. If it holds the outcome of a
+                validation of the same load script and data stores, that
+                validation is returned without any API request, otherwise
+                the outcome of the new validation is recorded once its
+                result stream completes. The cache is bypassed while the
+                load script or data stores have changes not yet saved
+                through update(), as the API validates the saved ones.
+
+        Returns:
+            User scenario validation resource instance.
+        """
+        if cache is not None and set(self.changed_fields()) & \
+                set(['load_script', 'data_stores']):
+            cache = None
+        if cache is not None:
+            validation = cache.get(self)
+            if validation is not None:
+                return validation
+        validation = self.client.create_user_scenario_validation(
             {'user_scenario_id': self.id})
+        if cache is not None:
+            validation.cache = cache
+            validation.cache_key = cache.key(self)
+        return validation
 
 
 class _UserScenarioValidationResultStream(Resource):
     resource_name = 'user-scenario-validations'
 
-    def __init__(self, validation):
+    # Minimum delay, in seconds, between polls returning no new results, so
+    # that polling never busy loops whatever the poll rate.
+    MIN_POLL_RATE = 0.5
+
+    def __init__(self, validation, max_results=None):
+        """Create result stream.
+
+        Args:
+            validation: User scenario validation resource instance.
+            max_results: Maximum number of past results to retain in
+                `results`, 0 to retain none, unlimited if None. The full log
+                of a validation to record in a validation cache is kept
+                separately.
+        """
         self.validation = validation
         self.last_offset = -1
-        self.results = []
+        if max_results is None:
+            self.results = []
+        else:
+            self.results = deque(maxlen=max_results)
+        self._log = [] if validation.cache is not None else None
+        self.polls = 0
         self.status = UserScenarioValidation.STATUS_QUEUED
         self.status_text = UserScenarioValidation.status_code_to_text(
             self.status)
 
-    def __call__(self, poll_rate=3):
+    def __call__(self, poll_rate=3, max_poll_rate=30, backoff=2):
+        """Poll validation results until validation is done.
+
+        The delay between polls starts at poll_rate, is multiplied by backoff
+        after every poll returning no new results, up to max_poll_rate, and
+        is reset to poll_rate when results arrive. Once a poll returns no
+        new results the delay is at least MIN_POLL_RATE.
+        """
+        min_poll_rate = self.__class__.MIN_POLL_RATE
+        delay = poll_rate
         while not self.is_done():
-            path = self.__class__._path(
-                resource_id=self.validation.id, action='results')
-            response = self.validation.client.get(
-                path, params={'offset': self.last_offset})
-            results = response.json()
-            self.status = results.get('status', self.status)
-            self.status_text = UserScenarioValidation.status_code_to_text(
-                self.status)
-            if 'results' in results:
-                for data in results['results']:
-                    self.last_offset = data['offset']
-                    yield data
-                self.results.extend(results['results'])
-                sleep(poll_rate)
+            results = self.poll()
+            for data in results:
+                yield data
+            if results:
+                delay = poll_rate
+            if not self.is_done():
+                if not results:
+                    delay = max(delay, min_poll_rate)
+                sleep(delay)
+                if not results:
+                    delay = min(delay * backoff,
+                                max(poll_rate, max_poll_rate, min_poll_rate))
 
         # Sync user scenario validation model to update status.
-        self.validation.sync()
+        if self.validation.cached_results is None:
+            self.validation.sync()
 
     def __iter__(self):
         return self.__call__()
 
+    def poll(self):
+        """Poll validation results once, updating status.
+
+        Returns:
+            List of new results.
+
+        Raises:
+            ResponseParseError: Unable to parse response from API.
+        """
+        if self.validation.cached_results is not None:
+            # Replay the outcome of a cached validation instead of polling.
+            body = {'status': self.validation.status,
+                    'results': [] if self.polls
+                    else self.validation.cached_results}
+        else:
+            path = self.__class__._path(
+                resource_id=self.validation.id, action='results')
+            response = self.validation.client.get(
+                path, params={'offset': self.last_offset})
+            try:
+                body = response.json()
+            except ValueError as e:
+                raise ResponseParseError(e)
+        self.polls += 1
+        self.status = body.get('status', self.status)
+        self.status_text = UserScenarioValidation.status_code_to_text(
+            self.status)
+        results = body.get('results') or []
+        if results:
+            self.last_offset = results[-1]['offset']
+            self.results.extend(results)
+            if self._log is not None:
+                self._log.extend(results)
+        if self.is_done() and self._log is not None:
+            self.validation.cache.record(self.validation, self.status,
+                                         self._log)
+        return results
+
     def is_done(self):
         """Check whether validation is done or not.
 
@@ -705,6 +1671,9 @@ class _UserScenarioValidationResultStream(Resource):
 
 
 class UserScenarioValidation(Resource, GetMixin, CreateMixin):
+    # Validation cache to record the outcome in and key to record it by, and
+    # results (log lines) of a validation returned from a validation cache.
+    __slots__ = ('cache', 'cache_key', 'cached_results')
     resource_name = 'user-scenario-validations'
     fields = {
         'id': IntegerField,
@@ -724,6 +1693,12 @@ class UserScenarioValidation(Resource, GetMixin, CreateMixin):
     STATUS_FINISHED = 3
     STATUS_FAILED = 4
 
+    def __init__(self, client, **kwargs):
+        self.cache = None
+        self.cache_key = None
+        self.cached_results = None
+        super(UserScenarioValidation, self).__init__(client, **kwargs)
+
     def is_done(self):
         """Check whether validation is done or not.
 
@@ -739,13 +1714,17 @@ class UserScenarioValidation(Resource, GetMixin, CreateMixin):
             return True
         return False
 
-    def result_stream(self):
+    def result_stream(self, max_results=None):
         """Get access to result stream.
 
+        Args:
+            max_results: Maximum number of past results for the stream to
+                retain, 0 to retain none, unlimited if None.
+
         Returns:
             User scenario validation result stream object.
         """
-        return self.__class__.stream_class(self)
+        return self.__class__.stream_class(self, max_results=max_results)
 
     @classmethod
     def status_code_to_text(cls, status_code):
@@ -0,0 +1,159 @@
+# coding=utf-8
+
+"""
+Copyright 2015 Load Impact
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+
+__all__ = ['Rollup']
+
+import bisect
+
+from .consumers import ResultConsumer
+from .resources import TestResult
+from .utils import numeric_value
+
+
+class _Tier(object):
+    """Buckets of one resolution for one result, kept ordered by start."""
+
+    def __init__(self, width):
+        self.width = width
+        self.starts = []
+        self.stats = []
+
+    def add(self, timestamp, value):
+        start = timestamp - timestamp % self.width if self.width else timestamp
+        if not self.starts or start > self.starts[-1]:
+            self.starts.append(start)
+            self.stats.append([value, value, value, 1])
+            return
+        i = bisect.bisect_left(self.starts, start)
+        if i == len(self.starts) or self.starts[i] != start:
+            self.starts.insert(i, start)
+            self.stats.insert(i, [value, value, value, 1])
+            return
+        s = self.stats[i]
+        if value < s[0]:
+            s[0] = value
+        if value > s[1]:
+            s[1] = value
+        s[2] += value
+        s[3] += 1
+
+    def span(self, start, end):
+        lo = 0 if start is None else bisect.bisect_left(self.starts, start)
+        hi = (len(self.starts) if end is None
+              else bisect.bisect_right(self.starts, end))
+        return lo, hi
+
+    def points(self, lo, hi):
+        return [{'timestamp': self.starts[i], 'min': s[0], 'max': s[1],
+                 'mean': s[2] / float(s[3]), 'count': s[3]}
+                for i, s in zip(range(lo, hi), self.stats[lo:hi])]
+
+
+class Rollup(ResultConsumer):
+    """Multi-resolution rollups of numeric test result series.
+
+    Every data point ingested by the stream the rollup is attached to is added
+    to one bucket per configured resolution, each bucket keeping the min, max,
+    sum and count of its values, so that a bounded number of points can be
+    queried per series regardless of test length.
+    """
+
+    # Default bucket widths in seconds, 0 meaning raw data points.
+    RESOLUTIONS = (0, 10, 60, 600)
+
+    def __init__(self, resolutions=RESOLUTIONS):
+        self.resolutions = sorted(resolutions)
+        self._tiers = {}
+
+    @property
+    def result_ids(self):
+        return list(self._tiers.keys())
+
+    def consume(self, stream, batch):
+        self.add(batch)
+
+    def add(self, batch):
+        """Add a batch of data points.
+
+        Args:
+            batch: Dict of result ID to list of data points.
+        """
+        for rid, data in batch.items():
+            tiers = self._tiers.get(rid)
+            if tiers is None:
+                tiers = self._tiers[rid] = [
+                    _Tier(r * TestResult.TIMESTAMP_RESOLUTION)
+                    for r in self.resolutions]
+            for point in data:
+                value = numeric_value(point)
+                timestamp = point.get('timestamp')
+                if value is None or timestamp is None:
+                    continue
+                for tier in tiers:
+                    tier.add(timestamp, value)
+
+    def series(self, result_id, resolution, start=None, end=None):
+        """Get buckets of a result at a given resolution.
+
+        Args:
+            result_id: Result ID.
+            resolution: Bucket width in seconds, one of the configured
+                resolutions.
+            start: Only include buckets starting at or after this timestamp.
+            end: Only include buckets starting at or before this timestamp.
+
+        Returns:
+            List of dicts with 'timestamp' (bucket start), 'min', 'max',
+            'mean' and 'count' keys.
+
+        Raises:
+            ValueError: Resolution is not configured for this rollup.
+        """
+        try:
+            i = self.resolutions.index(resolution)
+        except ValueError:
+            raise ValueError("Resolution %ss is not configured" % resolution)
+        tiers = self._tiers.get(result_id)
+        if not tiers:
+            return []
+        return tiers[i].points(*tiers[i].span(start, end))
+
+    def query(self, result_id, max_points=500, start=None, end=None):
+        """Get buckets of a result at the finest resolution yielding at most
+        max_points buckets in the requested time range, falling back to the
+        coarsest resolution.
+
+        Args:
+            result_id: Result ID.
+            max_points: Maximum number of buckets wanted.
+            start: Only include buckets starting at or after this timestamp.
+            end: Only include buckets starting at or before this timestamp.
+
+        Returns:
+            List of bucket dicts, see series().
+        """
+        tiers = self._tiers.get(result_id)
+        if not tiers:
+            return []
+        for tier in tiers:
+            lo, hi = tier.span(start, end)
+            if hi - lo <= max_points:
+                break
+        return tier.points(lo, hi)
@@ -0,0 +1,379 @@
+# coding=utf-8
+
+"""
+Copyright 2015 Load Impact
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+
+__all__ = ['Rule', 'RuleEngine', 'RuleEvent']
+
+import heapq
+import operator
+import re
+
+from collections import deque, namedtuple
+from .consumers import ResultConsumer
+from .resources import TestResult
+from .utils import numeric_value
+
+
+RuleEvent = namedtuple('RuleEvent', ['rule', 'kind', 'value', 'timestamp'])
+
+
+class _Percentile(object):
+    """Running percentile of a multiset of values supporting insertion and
+    removal in amortized logarithmic time.
+
+    Values are split over two heaps at the rank of the percentile, a max heap
+    of the lower values and a min heap of the upper ones, so the percentile is
+    the top of the lower heap. Removed values are only marked and discarded
+    once they surface at the top of a heap, with both heaps rebuilt when
+    marked values outnumber live ones.
+    """
+
+    def __init__(self, p):
+        self.p = p
+        self._low = []
+        self._high = []
+        self._low_size = 0
+        self._high_size = 0
+        self._removed = set()
+        self._seq = 0
+
+    def __len__(self):
+        return self._low_size + self._high_size
+
+    def add(self, value):
+        """Add value, returning a key to remove it by."""
+        self._seq += 1
+        key = (value, self._seq)
+        top = self._top(self._low)
+        if top is not None and key <= (-top[0], -top[1]):
+            heapq.heappush(self._low, (-value, -self._seq))
+            self._low_size += 1
+        else:
+            heapq.heappush(self._high, key)
+            self._high_size += 1
+        self._balance()
+        return key
+
+    def remove(self, key):
+        """Remove value added under key."""
+        top = self._top(self._low)
+        if top is not None and key <= (-top[0], -top[1]):
+            self._low_size -= 1
+        else:
+            self._high_size -= 1
+        self._removed.add(key[1])
+        if len(self._removed) > len(self):
+            self._compact()
+        self._balance()
+
+    def value(self):
+        top = self._top(self._low)
+        return -top[0]
+
+    def _top(self, heap):
+        neg = heap is self._low
+        while heap:
+            seq = -heap[0][1] if neg else heap[0][1]
+            if seq not in self._removed:
+                return heap[0]
+            self._removed.discard(seq)
+            heapq.heappop(heap)
+        return None
+
+    def _balance(self):
+        n = len(self)
+        size = int(round(self.p / 100.0 * (n - 1))) + 1 if n else 0
+        while self._low_size > size:
+            self._top(self._low)
+            value, seq = heapq.heappop(self._low)
+            heapq.heappush(self._high, (-value, -seq))
+            self._low_size -= 1
+            self._high_size += 1
+        while self._low_size < size:
+            self._top(self._high)
+            value, seq = heapq.heappop(self._high)
+            heapq.heappush(self._low, (-value, -seq))
+            self._low_size += 1
+            self._high_size -= 1
+
+    def _compact(self):
+        removed = self._removed
+        self._low = [e for e in self._low if -e[1] not in removed]
+        self._high = [e for e in self._high if e[1] not in removed]
+        heapq.heapify(self._low)
+        heapq.heapify(self._high)
+        self._removed = set()
+
+
+class _Window(object):
+    """Sliding time window of values with constant time amortized updates of
+    count, sum, min and max. A percentile is only maintained when asked for,
+    in amortized logarithmic time of the window size."""
+
+    def __init__(self, length, percentile=None):
+        self.length = length
+        self.values = deque()
+        self.sum = 0.0
+        self._min = deque()
+        self._max = deque()
+        self._percentile = (_Percentile(percentile)
+                            if percentile is not None else None)
+
+    def add(self, timestamp, value):
+        key = None
+        if self._percentile is not None:
+            key = self._percentile.add(value)
+        self.values.append((timestamp, value, key))
+        self.sum += value
+        while self._min and self._min[-1][1] > value:
+            self._min.pop()
+        self._min.append((timestamp, value))
+        while self._max and self._max[-1][1] < value:
+            self._max.pop()
+        self._max.append((timestamp, value))
+        start = timestamp - self.length
+        while self.values[0][0] < start:
+            old = self.values.popleft()
+            self.sum -= old[1]
+            if self._min[0] == old[:2]:
+                self._min.popleft()
+            if self._max[0] == old[:2]:
+                self._max.popleft()
+            if self._percentile is not None:
+                self._percentile.remove(old[2])
+
+    def count(self):
+        return len(self.values)
+
+    def mean(self):
+        return self.sum / len(self.values)
+
+    def min(self):
+        return self._min[0][1]
+
+    def max(self):
+        return self._max[0][1]
+
+    def percentile(self):
+        return self._percentile.value()
+
+
+class Rule(object):
+    """Threshold rule evaluated on a single test result.
+
+    A rule aggregates the values of a result over a sliding time window
+    (by default just the latest value) and compares the aggregate to a
+    threshold. It fires once the condition has held for `duration` seconds
+    and resolves when it stops holding.
+    """
+
+    AGGREGATIONS = ('value', 'mean', 'min', 'max', 'count', 'sum')
+    OPERATORS = {
+        '>': operator.gt,
+        '>=': operator.ge,
+        '<': operator.lt,
+        '<=': operator.le
+    }
+
+    _spec_re = re.compile(
+        r'^\s*(?:(?P<agg>\w+)\((?P<rid1>[^)]+)\)|(?P<rid2>\S+))\s*'
+        r'(?P<op>>=|<=|>|<)\s*(?P<threshold>[-+.\deE]+)%?'
+        r'(?:\s+over\s+(?P<window>[.\d]+)s)?'
+        r'(?:\s+for\s+(?P<duration>[.\d]+)s)?\s*$')
+
+    def __init__(self, result_id, op, threshold, aggregation='value',
+                 window=0, duration=0, abort=False, name=None):
+        """Create rule.
+
+        Args:
+            result_id: Result ID the rule applies to.
+            op: Comparison operator, one of '>', '>=', '<' and '<='.
+            threshold: Threshold value compared against.
+            aggregation: One of 'value' (latest value), 'mean', 'min', 'max',
+                'count', 'sum' or 'pNN' (percentile, e.g. 'p95').
+            window: Length of sliding window in seconds to aggregate over.
+            duration: Seconds the condition must hold before the rule fires.
+            abort: Whether to abort the test when the rule fires.
+            name: Rule name, defaults to a textual rule specification.
+        """
+        if op not in self.__class__.OPERATORS:
+            raise ValueError("Unknown operator '%s'" % op)
+        self.percentile = None
+        if re.match(r'^p\d+(\.\d+)?$', aggregation):
+            self.percentile = float(aggregation[1:])
+            if 100 < self.percentile:
+                raise ValueError("Percentile must be <= 100")
+        elif aggregation not in self.__class__.AGGREGATIONS:
+            raise ValueError("Unknown aggregation '%s'" % aggregation)
+        self.result_id = result_id
+        self.op = op
+        self.threshold = threshold
+        self.aggregation = aggregation
+        self.window = window
+        self.duration = duration
+        self.abort = abort
+        self.name = name or self.spec()
+        self._compare = self.__class__.OPERATORS[op]
+        self._window = _Window(window * TestResult.TIMESTAMP_RESOLUTION,
+                               percentile=self.percentile)
+        self._breach_start = None
+        self.firing = False
+
+    def __repr__(self):
+        return "<Rule %s>" % self.name
+
+    @classmethod
+    def parse(cls, spec, abort=False):
+        """Create rule from a textual specification.
+
+        Specifications have the form "[aggregation(]result_id[)] op threshold
+        [over N s] [for N s]", for example "FAILURE_RATE:1 > 5% for 60s" or
+        "p95(USER_LOAD_TIME:1) > 3000 over 60s". Result IDs may start with the
+        name of a TestResult constant.
+
+        Args:
+            spec: Rule specification string.
+            abort: Whether to abort the test when the rule fires.
+
+        Returns:
+            Rule instance.
+
+        Raises:
+            ValueError: Specification could not be parsed.
+        """
+        m = cls._spec_re.match(spec)
+        if not m:
+            raise ValueError("Invalid rule specification '%s'" % spec)
+        result_id = m.group('rid1') or m.group('rid2')
+        metric, sep, rest = result_id.partition(':')
+        if metric.isupper() and hasattr(TestResult, metric):
+            result_id = getattr(TestResult, metric) + sep + rest
+        return cls(result_id, m.group('op'), float(m.group('threshold')),
+                   aggregation=m.group('agg') or 'value',
+                   window=float(m.group('window') or 0),
+                   duration=float(m.group('duration') or 0),
+                   abort=abort, name=spec.strip())
+
+    def spec(self):
+        rid = self.result_id
+        if 'value' != self.aggregation:
+            rid = '%s(%s)' % (self.aggregation, rid)
+        s = '%s %s %s' % (rid, self.op, self.threshold)
+        if self.window:
+            s += ' over %ss' % self.window
+        if self.duration:
+            s += ' for %ss' % self.duration
+        return s
+
+    def evaluate(self, timestamp, value):
+        """Feed a value to the rule.
+
+        Args:
+            timestamp: Timestamp of value.
+            value: Numeric value.
+
+        Returns:
+            RuleEvent if the rule fired or resolved, otherwise None.
+        """
+        w = self._window
+        if 'value' == self.aggregation:
+            aggregate = value
+        else:
+            w.add(timestamp, value)
+            if self.percentile is not None:
+                aggregate = w.percentile()
+            elif 'mean' == self.aggregation:
+                aggregate = w.mean()
+            elif 'min' == self.aggregation:
+                aggregate = w.min()
+            elif 'max' == self.aggregation:
+                aggregate = w.max()
+            elif 'count' == self.aggregation:
+                aggregate = w.count()
+            else:
+                aggregate = w.sum
+
+        if not self._compare(aggregate, self.threshold):
+            self._breach_start = None
+            if self.firing:
+                self.firing = False
+                return RuleEvent(self, 'resolved', aggregate, timestamp)
+            return None
+        if self._breach_start is None:
+            self._breach_start = timestamp
+        if (not self.firing and timestamp - self._breach_start >=
+                self.duration * TestResult.TIMESTAMP_RESOLUTION):
+            self.firing = True
+            return RuleEvent(self, 'fired', aggregate, timestamp)
+        return None
+
+
+class RuleEngine(ResultConsumer):
+    """Evaluates rules incrementally on data points ingested by a test result
+    stream, emitting events to listeners and optionally aborting the test.
+
+    Every data point is only fed to the rules of its result ID, and each rule
+    is updated in amortized constant time (percentile rules in amortized
+    logarithmic time of their window size).
+    """
+
+    def __init__(self, rules=None, listeners=None):
+        self.events = []
+        self.aborted = False
+        self._rules = {}
+        self._listeners = list(listeners or [])
+        for rule in rules or []:
+            self.add_rule(rule)
+
+    @property
+    def rules(self):
+        return [rule for rules in self._rules.values() for rule in rules]
+
+    def add_rule(self, rule):
+        """Add rule, either a Rule instance or a textual specification."""
+        if not isinstance(rule, Rule):
+            rule = Rule.parse(rule)
+        self._rules.setdefault(rule.result_id, []).append(rule)
+        return rule
+
+    def add_listener(self, listener):
+        """Add callable called with every RuleEvent emitted."""
+        self._listeners.append(listener)
+
+    def consume(self, stream, batch):
+        for rid, data in batch.items():
+            rules = self._rules.get(rid)
+            if not rules:
+                continue
+            for point in data:
+                value = numeric_value(point)
+                if value is None:
+                    continue
+                timestamp = point.get('timestamp') or 0
+                for rule in rules:
+                    event = rule.evaluate(timestamp, value)
+                    if event:
+                        self._emit(stream, event)
+
+    def _emit(self, stream, event):
+        self.events.append(event)
+        for listener in self._listeners:
+            listener(event)
+        if 'fired' == event.kind and event.rule.abort and not self.aborted:
+            self.aborted = stream.test.abort()
@@ -0,0 +1,360 @@
+# coding=utf-8
+
+"""
+Copyright 2015 Load Impact
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+
+__all__ = ['CSVSink', 'JSONLinesSink', 'ParquetSink', 'to_arrow_table']
+
+import csv
+import gzip
+import json
+import os
+
+from .consumers import ResultConsumer
+from .resources import TestResult
+from .utils import numeric_value, optional_import
+
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+
+class _FileSink(ResultConsumer):
+    """Base class of sinks writing result data points to files.
+
+    Rows are buffered in memory and written out in chunks of at least
+    `buffer_size` bytes, so only a buffer's worth of data is ever held.
+    """
+
+    def __init__(self, path, buffer_size=65536, fsync_every=None,
+                 rotate_bytes=None, compress=False):
+        """Create sink.
+
+        Args:
+            path: Path of file to write. Rotated files are renamed to
+                path.1, path.2 and so on, in order of creation.
+            buffer_size: Bytes to buffer before writing to the file.
+            fsync_every: Sync the file to disk every this many writes, never
+                if None.
+            rotate_bytes: Start a new file once the current one holds at
+                least this many (uncompressed) bytes, never if None.
+            compress: Whether to gzip compress files.
+        """
+        self.path = path
+        self.buffer_size = buffer_size
+        self.fsync_every = fsync_every
+        self.rotate_bytes = rotate_bytes
+        self.compress = compress
+        self.rotated = []
+        self.rows_written = 0
+        self._buffer = []
+        self._buffered = 0
+        self._file = None
+        self._file_bytes = 0
+        self._writes = 0
+        self._started = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def consume(self, stream, batch):
+        self.write(stream.test.id, batch)
+
+    def finish(self, stream):
+        self.close()
+
+    def write(self, test_id, batch):
+        """Write a batch of data points.
+
+        Args:
+            test_id: ID of test the data points belong to.
+            batch: Dict of result ID to list of data points.
+        """
+        chunk = self._encode(test_id, batch)
+        if not chunk:
+            return
+        self._buffer.append(chunk)
+        self._buffered += len(chunk)
+        if self._buffered >= self.buffer_size:
+            self.flush()
+
+    def flush(self):
+        """Write buffered rows to the file."""
+        if not self._buffer:
+            return
+        if (self.rotate_bytes and self._started and
+                self._file_bytes >= self.rotate_bytes):
+            self._rotate()
+        if self._file is None:
+            self._open()
+        data = b''.join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+        self._file.write(data)
+        self._file.flush()
+        self._file_bytes += len(data)
+        self._writes += 1
+        if self.fsync_every and 0 == self._writes % self.fsync_every:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        """Flush buffered rows and close the file."""
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _encode(self, test_id, batch):
+        raise NotImplementedError
+
+    def _header(self):
+        return b''
+
+    def _open(self):
+        # Reopening after close() appends to the current file.
+        mode = 'ab' if self._started else 'wb'
+        if self.compress:
+            self._file = gzip.open(self.path, mode)
+        else:
+            self._file = open(self.path, mode)
+        if not self._started:
+            header = self._header()
+            self._file.write(header)
+            self._file_bytes = len(header)
+            self._started = True
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._started = False
+        rotated = '%s.%d' % (self.path, len(self.rotated) + 1)
+        os.rename(self.path, rotated)
+        self.rotated.append(rotated)
+
+
+class JSONLinesSink(_FileSink):
+    """Writes result data points as JSON objects, one per line, with
+    'test_id', 'result_id', 'offset', 'timestamp' and 'value' keys."""
+
+    def _encode(self, test_id, batch):
+        lines = []
+        for rid, data in batch.items():
+            for point in data:
+                lines.append(json.dumps({
+                    'test_id': test_id,
+                    'result_id': rid,
+                    'offset': point.get('offset'),
+                    'timestamp': point.get('timestamp'),
+                    'value': point.get('value')
+                }, sort_keys=True))
+                self.rows_written += 1
+        if not lines:
+            return b''
+        return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+class CSVSink(_FileSink):
+    """Writes result data points as CSV rows with test_id, result_id, offset,
+    timestamp and value columns, non-scalar values being JSON encoded. Every
+    file starts with a header row."""
+
+    COLUMNS = ('test_id', 'result_id', 'offset', 'timestamp', 'value')
+
+    def _encode(self, test_id, batch):
+        buf = StringIO()
+        writer = csv.writer(buf, lineterminator='\n')
+        for rid, data in batch.items():
+            for point in data:
+                value = point.get('value')
+                if isinstance(value, (dict, list)):
+                    value = json.dumps(value, sort_keys=True)
+                writer.writerow([test_id, rid, point.get('offset'),
+                                 point.get('timestamp'), value])
+                self.rows_written += 1
+        chunk = buf.getvalue()
+        if not isinstance(chunk, bytes):
+            chunk = chunk.encode('utf-8')
+        return chunk
+
+    def _header(self):
+        return (','.join(self.__class__.COLUMNS) + '\n').encode('utf-8')
+
+
+def _arrow_schema():
+    pyarrow = optional_import('pyarrow')
+    return pyarrow.schema([
+        ('test_id', pyarrow.int64()),
+        ('result_id', pyarrow.string()),
+        ('kind', pyarrow.string()),
+        ('metric', pyarrow.string()),
+        ('name_hash', pyarrow.string()),
+        ('load_zone_id', pyarrow.int64()),
+        ('user_scenario_id', pyarrow.int64()),
+        ('status_code', pyarrow.int64()),
+        ('method', pyarrow.string()),
+        ('timestamp', pyarrow.timestamp('us', tz='UTC')),
+        ('offset', pyarrow.int64()),
+        ('value', pyarrow.float64()),
+        ('value_json', pyarrow.string())
+    ])
+
+
+def _int_or_none(value):
+    return value if isinstance(value, int) else None
+
+
+class _ArrowColumns(object):
+    """Column-wise buffer of result data points with their result IDs split
+    into typed dimension columns."""
+
+    def __init__(self):
+        self.names = _arrow_schema().names
+        self.clear()
+
+    def __len__(self):
+        return len(self.columns['offset'])
+
+    def clear(self):
+        self.columns = dict([(name, []) for name in self.names])
+
+    def add(self, test_id, result_id, data):
+        c = self.columns
+        key = TestResult.parse_result_id(result_id)
+        dimensions = [
+            ('test_id', test_id),
+            ('result_id', result_id),
+            ('kind', key.kind),
+            ('metric', key.metric),
+            ('name_hash', key.name_hash),
+            ('load_zone_id', _int_or_none(key.load_zone_id)),
+            ('user_scenario_id', _int_or_none(key.user_scenario_id)),
+            ('status_code', _int_or_none(key.status_code)),
+            ('method', key.method)
+        ]
+        n = len(data)
+        for name, value in dimensions:
+            c[name].extend([value] * n)
+        c['timestamp'].extend([p.get('timestamp') for p in data])
+        c['offset'].extend([p.get('offset') for p in data])
+        for p in data:
+            value = numeric_value(p)
+            c['value'].append(None if value is None else float(value))
+            c['value_json'].append(
+                None if value is not None else json.dumps(p.get('value')))
+
+    def table(self):
+        pyarrow = optional_import('pyarrow')
+        return pyarrow.Table.from_pydict(self.columns, schema=_arrow_schema())
+
+
+def to_arrow_table(test_id, series):
+    """Convert result series of a test to an Arrow table with typed columns.
+
+    Args:
+        test_id: ID of test.
+        series: Dict of result ID to list of data points, e.g. the series of
+            a result stream or as loaded from a result store.
+
+    Returns:
+        pyarrow.Table with test_id, result_id, kind, metric, name_hash,
+        load_zone_id, user_scenario_id, status_code, method, timestamp,
+        offset, value (numeric values) and value_json (other values) columns.
+    """
+    if optional_import('pyarrow') is None:
+        raise ImportError("Arrow export requires pyarrow")
+    columns = _ArrowColumns()
+    for rid, data in series.items():
+        columns.add(test_id, rid, data)
+    return columns.table()
+
+
+class ParquetSink(ResultConsumer):
+    """Writes result data points to a Parquet file, with the typed columns of
+    to_arrow_table(), one row group per `row_group_size` rows as data streams
+    in.
+
+    Parquet files can't be appended to, so data written after the sink has
+    been closed (e.g. when attached to another stream) goes to a new part
+    file, 'results.1.parquet', 'results.2.parquet' and so on for path
+    'results.parquet'. All files written are listed in `paths`.
+    """
+
+    def __init__(self, path, row_group_size=65536, compression='snappy'):
+        if optional_import('pyarrow.parquet') is None:
+            raise ImportError("ParquetSink requires pyarrow")
+        self.path = path
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.rows_written = 0
+        self.paths = []
+        self._columns = _ArrowColumns()
+        self._writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def consume(self, stream, batch):
+        self.write(stream.test.id, batch)
+
+    def finish(self, stream):
+        self.close()
+
+    def write(self, test_id, batch):
+        """Write a batch of data points.
+
+        Args:
+            test_id: ID of test the data points belong to.
+            batch: Dict of result ID to list of data points.
+        """
+        for rid, data in batch.items():
+            self._columns.add(test_id, rid, data)
+        if len(self._columns) >= self.row_group_size:
+            self.flush()
+
+    def flush(self):
+        """Write buffered rows as a row group."""
+        rows = len(self._columns)
+        if not rows:
+            return
+        if self._writer is None:
+            path = self.path
+            if self.paths:
+                root, ext = os.path.splitext(self.path)
+                path = '%s.%d%s' % (root, len(self.paths), ext)
+            self._writer = optional_import('pyarrow.parquet').ParquetWriter(
+                path, _arrow_schema(), compression=self.compression)
+            self.paths.append(path)
+        self._writer.write_table(self._columns.table(),
+                                 row_group_size=self.row_group_size)
+        self._columns.clear()
+        self.rows_written += rows
+
+    def close(self):
+        """Flush buffered rows and close the file."""
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
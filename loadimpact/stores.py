@@ -0,0 +1,161 @@
+# coding=utf-8
+
+"""
+Copyright 2015 Load Impact
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+
+__all__ = ['ResultStore']
+
+import json
+import sqlite3
+import threading
+
+from .consumers import ResultConsumer
+
+
+class ResultStore(ResultConsumer):
+    """Persistent SQLite backed store of test result data points.
+
+    Data points are indexed by (test ID, result ID, offset) and by timestamp.
+    A store can be attached to a test result stream to record streamed data,
+    and used to load complete series for a test, only fetching the offsets
+    not already stored from the API.
+    """
+
+    _schema = [
+        """CREATE TABLE IF NOT EXISTS results (
+            test_id INTEGER NOT NULL,
+            result_id TEXT NOT NULL,
+            offset INTEGER NOT NULL,
+            timestamp INTEGER,
+            value TEXT,
+            PRIMARY KEY (test_id, result_id, offset)
+        )""",
+        """CREATE INDEX IF NOT EXISTS results_timestamp
+            ON results (test_id, result_id, timestamp)"""
+    ]
+
+    def __init__(self, path=':memory:'):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            for statement in self.__class__._schema:
+                self._conn.execute(statement)
+
+    def close(self):
+        self._conn.close()
+
+    def consume(self, stream, batch):
+        self.write(stream.test.id, batch)
+
+    def write(self, test_id, batch):
+        """Write a batch of data points in a single transaction.
+
+        Args:
+            test_id: ID of test the data points belong to.
+            batch: Dict of result ID to list of data points.
+
+        Returns:
+            Number of data points written. Points already stored are ignored.
+        """
+        rows = []
+        for rid, data in batch.items():
+            for point in data:
+                rows.append((test_id, rid, point['offset'],
+                             point.get('timestamp'),
+                             json.dumps(point.get('value'))))
+        with self._lock:
+            with self._conn:
+                before = self._conn.total_changes
+                self._conn.executemany(
+                    'INSERT OR IGNORE INTO results VALUES (?, ?, ?, ?, ?)',
+                    rows)
+                return self._conn.total_changes - before
+
+    def last_offset(self, test_id, result_id):
+        """Get offset of the last stored data point of a result, -1 if the
+        store holds no data for it."""
+        rows = self._query(
+            'SELECT MAX(offset) FROM results WHERE test_id = ? AND '
+            'result_id = ?', (test_id, result_id))
+        return -1 if rows[0][0] is None else rows[0][0]
+
+    def result_ids(self, test_id):
+        """Get list of result IDs with stored data for a test."""
+        rows = self._query(
+            'SELECT DISTINCT result_id FROM results WHERE test_id = ? '
+            'ORDER BY result_id', (test_id,))
+        return [row[0] for row in rows]
+
+    def series(self, test_id, result_id, start=None, end=None,
+               after_offset=None):
+        """Query stored data points of a result.
+
+        Args:
+            test_id: ID of test.
+            result_id: Result ID.
+            start: Only include data points with a timestamp >= start.
+            end: Only include data points with a timestamp <= end.
+            after_offset: Only include data points with an offset greater than
+                this.
+
+        Returns:
+            List of data points ordered by offset.
+        """
+        sql = ['SELECT offset, timestamp, value FROM results '
+               'WHERE test_id = ? AND result_id = ?']
+        args = [test_id, result_id]
+        if start is not None:
+            sql.append('AND timestamp >= ?')
+            args.append(start)
+        if end is not None:
+            sql.append('AND timestamp <= ?')
+            args.append(end)
+        if after_offset is not None:
+            sql.append('AND offset > ?')
+            args.append(after_offset)
+        sql.append('ORDER BY offset')
+        rows = self._query(' '.join(sql), args)
+        return [{'offset': offset, 'timestamp': timestamp,
+                 'value': json.loads(value)}
+                for offset, timestamp, value in rows]
+
+    def load(self, test, result_ids, start=None, end=None, max_workers=4):
+        """Load complete series of a test, fetching only data points newer
+        than the ones already stored from the API.
+
+        Args:
+            test: Test resource instance.
+            result_ids: List of result IDs to load.
+            start: Only include data points with a timestamp >= start.
+            end: Only include data points with a timestamp <= end.
+            max_workers: Maximum number of concurrent API requests.
+
+        Returns:
+            Dict of result ID to list of data points.
+        """
+        offsets = dict([(rid, self.last_offset(test.id, rid))
+                        for rid in result_ids])
+        self.write(test.id, test.fetch_results(result_ids, offsets=offsets,
+                                               max_workers=max_workers))
+        return dict([(rid, self.series(test.id, rid, start=start, end=end))
+                     for rid in result_ids])
+
+    def _query(self, sql, args):
+        with self._lock:
+            return self._conn.execute(sql, args).fetchall()
@@ -18,8 +18,93 @@ limitations under the License.
 
 __all__ = ['UTC']
 
+import sys
+import threading
+
+from collections import deque
 from datetime import timedelta, tzinfo
 
+try:
+    import Queue as queue
+except ImportError:
+    import queue
+
+class LRUDict(object):
+    """Mapping holding the `maxsize` most recently set items, evicting the
+    least recently set ones, without OrderedDict (Python 2.7+).
+
+    Every assignment appends to a queue of (stamp, key) entries, the
+    outdated ones skipped when evicting and purged once they make up half
+    of the queue, so assignments take amortized constant time. Reading an
+    item does not count as using it, set it again for that. Not thread
+    safe.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._items = {}
+        self._order = deque()
+        self._stamp = 0
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def __getitem__(self, key):
+        return self._items[key][0]
+
+    def __setitem__(self, key, value):
+        self._stamp += 1
+        self._items[key] = (value, self._stamp)
+        self._order.append((self._stamp, key))
+        items = self._items
+        while self.maxsize is not None and len(items) > self.maxsize:
+            stamp, old = self._order.popleft()
+            if items[old][1] == stamp:
+                del items[old]
+        if len(self._order) > 2 * len(items) + 8:
+            self._order = deque(sorted(
+                [(item[1], k) for k, item in items.items()]))
+
+    def get(self, key, default=None):
+        item = self._items.get(key)
+        return default if item is None else item[0]
+
+    def clear(self):
+        self._items.clear()
+        self._order.clear()
+
+
+try:
+    from functools import lru_cache
+except ImportError:
+    from functools import wraps
+
+    def lru_cache(maxsize=128):
+        """Minimal stand-in for functools.lru_cache on Python 2, memoizing a
+        function of hashable positional arguments."""
+        def decorator(func):
+            cache = LRUDict(maxsize)
+            lock = threading.Lock()
+
+            @wraps(func)
+            def wrapper(*args):
+                with lock:
+                    if args in cache:
+                        value = cache[args]
+                        cache[args] = value
+                        return value
+                value = func(*args)
+                with lock:
+                    cache[args] = value
+                return value
+
+            wrapper.cache_clear = cache.clear
+            return wrapper
+        return decorator
+
 
 _ZERO = timedelta(0)
 
@@ -40,7 +125,135 @@ def is_dict_different(d1, d2, epsilon=0.00000000001):
     return (0 < len(added) or 0 < len(removed) or 0 < len(set(changed)))
 
 
+def with_metaclass(meta, *bases):
+    """Create a base class with a metaclass, in a way that works on both
+    Python 2 and 3."""
+    class metaclass(meta):
+        def __new__(cls, name, this_bases, d):
+            return meta(name, bases, d)
+    return type.__new__(metaclass, 'temporary_class', (), {})
+
+
+def numeric_value(point):
+    """Get numeric value of a result data point, None if it has none."""
+    value = point.get('value')
+    if isinstance(value, dict):
+        value = value.get('value')
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return None
+    return value
+
+
+def map_concurrently(func, items, max_workers=4):
+    """Apply func to every item using a bounded pool of worker threads.
+
+    Args:
+        func: Callable taking a single item.
+        items: List of items.
+        max_workers: Maximum number of worker threads.
+
+    Returns:
+        List of results, in the same order as items.
+
+    Raises:
+        The first exception raised by func, once all workers have stopped.
+    """
+    items = list(items)
+    results = [None] * len(items)
+    errors = []
+    tasks = queue.Queue()
+    for task in enumerate(items):
+        tasks.put(task)
+
+    def work():
+        while not errors:
+            try:
+                i, item = tasks.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                results[i] = func(item)
+            except Exception:
+                errors.append(sys.exc_info())
+
+    workers = [threading.Thread(target=work)
+               for _ in range(max(1, min(max_workers, len(items))))]
+    for worker in workers:
+        worker.daemon = True
+        worker.start()
+    for worker in workers:
+        worker.join()
+    if errors:
+        raise errors[0][1]
+    return results
+
+
+_optional_modules = {}
+
+
+def optional_import(name):
+    """Import an optional dependency, e.g. NumPy, on first use rather than
+    when importing the package, so that importing loadimpact stays cheap.
+
+    Args:
+        name: Module name, e.g. 'numpy' or 'pyarrow.parquet'.
+
+    Returns:
+        The module, or None if it is not installed.
+    """
+    try:
+        return _optional_modules[name]
+    except KeyError:
+        pass
+    try:
+        __import__(name)
+        module = sys.modules[name]
+    except ImportError:
+        module = None
+    _optional_modules[name] = module
+    return module
+
+
+class BackgroundCall(object):
+    """Call of a function in a daemon thread, e.g. to fetch data while other
+    data is being processed."""
+
+    def __init__(self, func, *args, **kwargs):
+        self._result = None
+        self._error = None
+        self._thread = threading.Thread(target=self._run,
+                                        args=(func, args, kwargs))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, func, args, kwargs):
+        try:
+            self._result = func(*args, **kwargs)
+        except Exception:
+            self._error = sys.exc_info()
+
+    def result(self):
+        """Wait for the call to complete and get its return value.
+
+        Raises:
+            The exception raised by the function, if any.
+        """
+        self._thread.join()
+        if self._error is not None:
+            raise self._error[1]
+        return self._result
+
+
 class UTC(tzinfo):
+    """UTC time zone. All instances are the same (singleton) instance."""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super(UTC, cls).__new__(cls)
+        return cls._instance
+
     def utcoffset(self, dt):
         return _ZERO
 
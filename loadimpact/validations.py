@@ -0,0 +1,304 @@
+# coding=utf-8
+
+"""
+Copyright 2015 Load Impact
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+from __future__ import absolute_import
+
+__all__ = ['ValidationCache', 'ValidationOutcome', 'ValidationReport',
+           'validate_user_scenarios']
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+from time import sleep
+from .exceptions import ApiError
+from .resources import UserScenarioValidation
+from .utils import map_concurrently
+
+
+class ValidationCache(object):
+    """Cache of user scenario validation outcomes, keyed by a hash of the
+    load script and data store IDs validated, to skip re-validating
+    unchanged user scenarios (see UserScenario.validate()).
+
+    Only successful validations are cached unless include_failed is set.
+    Entries expire `ttl` seconds after being recorded, and are persisted to
+    a JSON file when a path is given.
+    """
+
+    def __init__(self, path=None, ttl=None, include_failed=False):
+        """Create cache.
+
+        Args:
+            path: Path of JSON file to load and persist entries in, entries
+                are only kept in memory if None.
+            ttl: Seconds entries stay valid, forever if None.
+            include_failed: Whether to also cache failed validations.
+        """
+        self.path = path
+        self.ttl = ttl
+        self.include_failed = include_failed
+        self._entries = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self._entries = json.load(f)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @classmethod
+    def key(cls, user_scenario):
+        """Get cache key of a user scenario, a hash of its load script and
+        data store IDs."""
+        data = json.dumps([user_scenario.load_script,
+                           sorted(user_scenario.data_stores)])
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def get(self, user_scenario):
+        """Get the cached validation of a user scenario.
+
+        Args:
+            user_scenario: User scenario resource instance.
+
+        Returns:
+            User scenario validation resource instance, whose result stream
+            replays the cached results without API requests, or None if no
+            valid entry is cached.
+        """
+        key = self.__class__.key(user_scenario)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self.ttl is not None and \
+                    time.time() - entry['recorded'] > self.ttl:
+                del self._entries[key]
+                self._save()
+                return None
+        validation = UserScenarioValidation(
+            user_scenario.client, id=entry['validation_id'],
+            user_scenario_id=user_scenario.id, status=entry['status'],
+            status_text=UserScenarioValidation.status_code_to_text(
+                entry['status']))
+        validation.cached_results = entry['results']
+        return validation
+
+    def record(self, validation, status, results):
+        """Record the outcome of a completed validation started through
+        UserScenario.validate() with this cache.
+
+        Args:
+            validation: User scenario validation resource instance.
+            status: Final validation status.
+            results: Validation results (log lines) to replay on cache hits.
+        """
+        if validation.cache_key is None:
+            return
+        if UserScenarioValidation.STATUS_FINISHED != status and \
+                not self.include_failed:
+            return
+        with self._lock:
+            self._entries[validation.cache_key] = {
+                'validation_id': validation.id,
+                'status': status,
+                'results': results,
+                'recorded': time.time()
+            }
+            self._save()
+
+    def invalidate(self, user_scenario=None):
+        """Drop the cached outcome of a user scenario, or of all."""
+        with self._lock:
+            if user_scenario is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(self.__class__.key(user_scenario), None)
+            self._save()
+
+    def _save(self):
+        if not self.path:
+            return
+        tmp = '%s.%d.tmp' % (self.path, os.getpid())
+        with open(tmp, 'w') as f:
+            json.dump(self._entries, f)
+        os.rename(tmp, self.path)
+
+
+class ValidationOutcome(object):
+    """Outcome of the validation of one user scenario."""
+
+    def __init__(self, user_scenario, validation=None, error=None):
+        self.user_scenario = user_scenario
+        self.validation = validation
+        self.error = error
+        self.stream = None
+        self.cached = (validation is not None and
+                       validation.cached_results is not None)
+        self.status = (UserScenarioValidation.STATUS_FAILED
+                       if error is not None
+                       else UserScenarioValidation.STATUS_QUEUED)
+        self.started = time.time()
+        self.ended = self.started if error is not None else None
+
+    def __repr__(self):
+        return "<ValidationOutcome user_scenario=%s %s>" % (
+            self.user_scenario.id, self.status_text)
+
+    @property
+    def status_text(self):
+        return UserScenarioValidation.status_code_to_text(self.status)
+
+    @property
+    def done(self):
+        return self.ended is not None
+
+    @property
+    def passed(self):
+        return UserScenarioValidation.STATUS_FINISHED == self.status
+
+    @property
+    def duration(self):
+        """Seconds from starting to completing validation, None while not
+        done."""
+        return None if self.ended is None else self.ended - self.started
+
+    @property
+    def results(self):
+        """Retained validation results (log lines)."""
+        return [] if self.stream is None else list(self.stream.results)
+
+
+class ValidationReport(object):
+    """Consolidated report of the validation of several user scenarios."""
+
+    def __init__(self, outcomes, duration):
+        self.outcomes = outcomes
+        self.duration = duration
+
+    def __iter__(self):
+        return iter(self.outcomes)
+
+    def __len__(self):
+        return len(self.outcomes)
+
+    @property
+    def passed(self):
+        """True if all user scenarios passed validation."""
+        return all(o.passed for o in self.outcomes)
+
+    @property
+    def failures(self):
+        """Outcomes of user scenarios that failed validation."""
+        return [o for o in self.outcomes if not o.passed]
+
+    def summary(self):
+        """Get a human readable summary, one line per user scenario."""
+        lines = []
+        for o in self.outcomes:
+            line = '%s %s: %s' % ('PASS' if o.passed else 'FAIL',
+                                  o.user_scenario.id, o.status_text)
+            if o.cached:
+                line += ' (cached)'
+            elif o.duration is not None:
+                line += ' (%.1fs)' % o.duration
+            if o.error is not None:
+                line += ' - %s' % o.error
+            lines.append(line)
+        lines.append('%d/%d passed in %.1fs' % (
+            len(self.outcomes) - len(self.failures), len(self.outcomes),
+            self.duration))
+        return '\n'.join(lines)
+
+
+def validate_user_scenarios(user_scenarios, max_workers=8, poll_rate=3,
+                            max_poll_rate=30, backoff=2, max_results=100,
+                            cache=None):
+    """Validate several user scenarios concurrently.
+
+    Validations are created concurrently and then all polled by one shared
+    poller, a round of concurrent requests at a time, until every validation
+    is done. The delay between rounds starts at poll_rate, is multiplied by
+    backoff after every round without new results, up to max_poll_rate, and
+    is reset to poll_rate when results arrive. After a round without new
+    results the delay is at least the MIN_POLL_RATE of validation result
+    streams.
+
+    Args:
+        user_scenarios: List of user scenario resource instances.
+        max_workers: Maximum number of concurrent API requests.
+        poll_rate: Initial delay between polling rounds, in seconds.
+        max_poll_rate: Maximum delay between polling rounds, in seconds.
+        backoff: Delay multiplier for rounds without new results.
+        max_results: Maximum number of results (log lines) to retain per
+            validation, 0 to retain none, unlimited if None.
+
+    Returns:
+        ValidationReport with one outcome per user scenario, in order.
+        Validations that could not be created or polled are reported as
+        failed with the API error.
+    """
+    started = time.time()
+
+    def create(user_scenario):
+        try:
+            outcome = ValidationOutcome(user_scenario,
+                                        validation=user_scenario.validate(
+                                            cache=cache))
+        except ApiError as e:
+            return ValidationOutcome(user_scenario, error=e)
+        outcome.stream = outcome.validation.result_stream(
+            max_results=max_results)
+        return outcome
+
+    def poll(outcome):
+        try:
+            results = outcome.stream.poll()
+            if outcome.stream.is_done() and not outcome.cached:
+                outcome.validation.sync()
+        except ApiError as e:
+            outcome.error = e
+            outcome.status = UserScenarioValidation.STATUS_FAILED
+            outcome.ended = time.time()
+            return False
+        outcome.status = outcome.stream.status
+        if outcome.stream.is_done():
+            outcome.ended = time.time()
+        return bool(results)
+
+    outcomes = map_concurrently(create, user_scenarios,
+                                max_workers=max_workers)
+    min_poll_rate = UserScenarioValidation.stream_class.MIN_POLL_RATE
+    delay = poll_rate
+    pending = [o for o in outcomes if not o.done]
+    while pending:
+        progress = map_concurrently(poll, pending, max_workers=max_workers)
+        pending = [o for o in pending if not o.done]
+        if not pending:
+            break
+        if any(progress):
+            delay = poll_rate
+        else:
+            delay = max(delay, min_poll_rate)
+        sleep(delay)
+        if not any(progress):
+            delay = min(delay * backoff,
+                        max(poll_rate, max_poll_rate, min_poll_rate))
+    return ValidationReport(outcomes, time.time() - started)
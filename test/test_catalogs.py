@@ -0,0 +1,167 @@
+# coding=utf-8
+
+"""
+Copyright 2015 Load Impact
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import unittest
+
+from loadimpact.catalogs import ResultCatalog, ResultIndex
+from loadimpact.clients import Client
+from loadimpact.exceptions import NotFoundError
+from loadimpact.resources import LoadZone, Test, TestConfig, TestResult
+
+
+class MockRequestsResponse(object):
+    def __init__(self, status_code=200, body=None):
+        self.url = 'http://example.com/'
+        self.status_code = status_code
+        self.text = ''
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+class MockClient(Client):
+    def __init__(self, response_status_code=200, response_body=None):
+        super(MockClient, self).__init__()
+        self.response_status_code = response_status_code
+        self.response_body = response_body
+        self.requests = 0
+        self.last_request_args = None
+
+    def _requests_request(self, method, *args, **kwargs):
+        self.requests += 1
+        self.last_request_args = args
+        return MockRequestsResponse(status_code=self.response_status_code,
+                                    body=self.response_body)
+
+
+URL_11 = '__li_url_%s:11:1:200:GET' % ('a' * 32)
+URL_12 = '__li_url_%s:12:1:200:GET' % ('b' * 32)
+
+
+class TestCatalogsResultCatalog(unittest.TestCase):
+    def setUp(self):
+        self.catalog = ResultCatalog()
+
+    def test_result_ids(self):
+        client = MockClient(response_body=[
+            '__li_user_load_time:1',
+            {'id': URL_11, 'name': 'http://example.com/'}])
+        test = Test(client, id=1)
+        self.assertEqual(self.catalog.result_ids(test),
+                         [URL_11, '__li_user_load_time:1'])
+        self.assertTrue(client.last_request_args[0].endswith(
+            'tests/1/result_ids'))
+        self.assertEqual(self.catalog.names, {URL_11: 'http://example.com/'})
+
+    def test_result_ids_grouped(self):
+        client = MockClient(response_body={
+            'common': ['__li_user_load_time:1'],
+            'url': [URL_11]})
+        test = Test(client, id=1)
+        self.assertEqual(self.catalog.result_ids(test),
+                         [URL_11, '__li_user_load_time:1'])
+
+    def test_result_ids_cached(self):
+        client = MockClient(response_body=[URL_11])
+        test = Test(client, id=1)
+        self.catalog.result_ids(test)
+        self.catalog.result_ids(test)
+        self.assertEqual(client.requests, 1)
+        self.catalog.result_ids(test, refresh=True)
+        self.assertEqual(client.requests, 2)
+        self.catalog.invalidate(test)
+        self.catalog.result_ids(test)
+        self.assertEqual(client.requests, 3)
+
+    def test_result_ids_from_config(self):
+        test_config = TestConfig(None)
+        test_config.add_user_scenario_with_id(
+            42, load_zone_id=LoadZone.AMAZON_US_ASHBURN)
+        result_ids = ResultCatalog.result_ids_from_config(test_config)
+        self.assertTrue(TestResult.LIVE_FEEDBACK in result_ids)
+        self.assertTrue('__li_clients_active:1' in result_ids)
+        self.assertTrue('__li_clients_active:11' in result_ids)
+        self.assertTrue('__li_user_load_time:11:42' in result_ids)
+        self.assertTrue('__li_user_load_time:1:42' in result_ids)
+
+    def test_result_ids_config_fallback(self):
+        client = MockClient(response_status_code=404)
+        test = Test(client, id=1)
+        self.assertRaises(NotFoundError, self.catalog.result_ids, test)
+        test_config = TestConfig(None)
+        self.assertEqual(
+            self.catalog.result_ids(test, test_config=test_config),
+            sorted(ResultCatalog.result_ids_from_config(test_config)))
+
+    def test_match(self):
+        client = MockClient(response_body=[
+            '__li_user_load_time:1', URL_11, URL_12])
+        test = Test(client, id=1)
+        self.assertEqual(self.catalog.match(test, '__li_url_*:11:*'), [URL_11])
+        self.assertEqual(
+            self.catalog.match(test, '__li_url_*:11:*', '__li_user_*'),
+            [URL_11, '__li_user_load_time:1'])
+
+    def test_result_stream(self):
+        client = MockClient(response_body=[URL_11, URL_12])
+        test = Test(client, id=1)
+        stream = self.catalog.result_stream(test, '__li_url_*')
+        self.assertEqual(stream.result_ids, [URL_11, URL_12])
+        self.assertRaises(ValueError, self.catalog.result_stream, test,
+                          '__custom_*')
+
+
+class TestCatalogsResultIndex(unittest.TestCase):
+    def setUp(self):
+        self.urls = ['http://example.com/', 'http://example.com/a']
+        self.result_ids = (
+            TestResult.result_ids_for_urls(self.urls, [11, 12], [1],
+                                           status_codes=[200, 404]) +
+            ['__li_user_load_time:1', '__li_user_load_time:11:1'])
+        self.index = ResultIndex(self.result_ids)
+
+    def test_len(self):
+        self.assertEqual(len(self.index), 10)
+        self.assertTrue('__li_user_load_time:1' in self.index)
+
+    def test_key(self):
+        key = self.index.key(self.result_ids[0])
+        self.assertEqual(key.kind, 'url')
+        self.assertEqual(key.name, self.urls[0])
+        self.assertEqual(key.load_zone_id, 11)
+        self.assertEqual(key.user_scenario_id, 1)
+        self.assertEqual(key.status_code, 200)
+        self.assertEqual(key.method, 'GET')
+
+    def test_group_by(self):
+        groups = self.index.group_by('load_zone_id')
+        self.assertEqual(sorted(groups.keys()), [1, 11, 12])
+        self.assertEqual(len(groups[11]), 5)
+        self.assertEqual(len(self.index.group_by('name')[self.urls[1]]), 4)
+
+    def test_select(self):
+        self.assertEqual(len(self.index.select(kind='url', load_zone_id=11)),
+                         4)
+        self.assertEqual(
+            self.index.select(kind='url', load_zone_id=11, status_code=404,
+                              name=self.urls[0]),
+            [TestResult.result_id_for_url(self.urls[0], 11, 1,
+                                          status_code=404)])
+        self.assertEqual(self.index.select(load_zone_id=13), [])
+        self.assertEqual(len(self.index.select()), 10)
@@ -0,0 +1,162 @@
+# coding=utf-8
+
+"""
+Copyright 2015 Load Impact
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import unittest
+
+from loadimpact import comparisons
+from loadimpact.comparisons import RunComparison
+from loadimpact.resources import TestResult
+from loadimpact.utils import optional_import
+
+
+LOAD_TIME = TestResult.result_id_from_name(TestResult.USER_LOAD_TIME,
+                                           load_zone_id=1)
+RPS = TestResult.result_id_from_name(TestResult.REQUESTS_PER_SECOND,
+                                     load_zone_id=1)
+USERS = TestResult.result_id_from_name(TestResult.ACTIVE_USERS,
+                                       load_zone_id=1)
+S = TestResult.TIMESTAMP_RESOLUTION
+
+
+def series(values, start=0, step=1):
+    return [{'offset': i, 'timestamp': (start + i * step) * S, 'value': v}
+            for i, v in enumerate(values)]
+
+
+@unittest.skipIf(optional_import('numpy') is None, "requires numpy")
+class TestComparisonsRunComparison(unittest.TestCase):
+    def test_unknown_alignment(self):
+        self.assertRaises(ValueError, RunComparison, {}, {}, align='x')
+
+    def test_align_elapsed(self):
+        # Candidate run started later; alignment is relative to each start.
+        baseline = {LOAD_TIME: series([1, 3, 5, 7], step=5)}
+        candidate = {LOAD_TIME: series([2, 4, 6], start=1000, step=5)}
+        keys, b, c = RunComparison(baseline, candidate).aligned(LOAD_TIME)
+        self.assertEqual(keys.tolist(), [0, 10])
+        self.assertEqual(b.tolist(), [2.0, 6.0])
+        self.assertEqual(c.tolist(), [3.0, 6.0])
+
+    def test_align_users(self):
+        baseline = {
+            USERS: series([10, 20, 30], step=10),
+            LOAD_TIME: series([100, 200, 300], start=5, step=10)
+        }
+        candidate = {
+            USERS: series([10, 30], step=30),
+            LOAD_TIME: series([110, 330], start=5, step=30)
+        }
+        comparison = RunComparison(baseline, candidate, align='users',
+                                   users_result_id=USERS)
+        keys, b, c = comparison.aligned(LOAD_TIME)
+        self.assertEqual(keys.tolist(), [10, 30])
+        self.assertEqual(b.tolist(), [100.0, 300.0])
+        self.assertEqual(c.tolist(), [110.0, 330.0])
+
+    def test_align_users_missing_series(self):
+        self.assertRaises(ValueError, RunComparison, {LOAD_TIME: []},
+                          {LOAD_TIME: []}, align='users')
+
+    def test_regression(self):
+        baseline = {LOAD_TIME: series([100, 102, 98, 101, 99, 100])}
+        candidate = {LOAD_TIME: series([130, 128, 131, 129, 132, 130])}
+        c = RunComparison(baseline, candidate, resolution=1).compare(
+            LOAD_TIME)
+        self.assertEqual(c.samples, 6)
+        self.assertEqual(c.baseline, 100.0)
+        self.assertEqual(c.candidate, 130.0)
+        self.assertAlmostEqual(c.relative_delta, 0.3)
+        self.assertTrue(c.p_value < 0.05)
+        self.assertTrue(c.regression)
+
+    def test_few_buckets_uses_student_t(self):
+        baseline = {LOAD_TIME: series([100, 100, 100, 100])}
+        candidate = {LOAD_TIME: series([125, 105, 130, 112])}
+        c = RunComparison(baseline, candidate, resolution=1).compare(
+            LOAD_TIME)
+        self.assertAlmostEqual(c.t, 3.13, places=2)
+        self.assertAlmostEqual(c.p_value, 0.052, places=3)
+        self.assertFalse(c.regression)
+
+    def test_t_p_value(self):
+        # Two-sided critical values of Student's t distribution.
+        for t, df, p in ((12.706, 1, 0.05), (2.228, 10, 0.05),
+                         (2.845, 20, 0.01), (1.960, 10 ** 6, 0.05)):
+            self.assertAlmostEqual(comparisons._t_p_value(t, df), p,
+                                   places=4)
+        self.assertEqual(comparisons._t_p_value(0.0, 3), 1.0)
+
+    def test_improvement_is_not_regression(self):
+        baseline = {LOAD_TIME: series([130, 128, 131, 129, 132, 130]),
+                    RPS: series([100, 102, 98, 101, 99, 100])}
+        candidate = {LOAD_TIME: series([100, 102, 98, 101, 99, 100]),
+                     RPS: series([130, 128, 131, 129, 132, 130])}
+        comparison = RunComparison(baseline, candidate, resolution=1)
+        self.assertEqual(comparison.result_ids, sorted([LOAD_TIME, RPS]))
+        self.assertEqual(comparison.regressions(), [])
+
+    def test_higher_is_better_regression(self):
+        baseline = {RPS: series([130, 128, 131, 129, 132, 130])}
+        candidate = {RPS: series([100, 102, 98, 101, 99, 100])}
+        comparison = RunComparison(baseline, candidate, resolution=1)
+        self.assertEqual([c.result_id for c in comparison.regressions()],
+                         [RPS])
+
+    def test_small_change_is_not_regression(self):
+        baseline = {LOAD_TIME: series([100, 100, 100, 100])}
+        candidate = {LOAD_TIME: series([105, 105, 105, 105])}
+        c = RunComparison(baseline, candidate, resolution=1).compare(
+            LOAD_TIME)
+        self.assertEqual(c.p_value, 0.0)
+        self.assertFalse(c.regression)
+
+    def test_constant_difference_sign(self):
+        baseline = {LOAD_TIME: series([100, 100, 100, 100])}
+        for values, t in (([90] * 4, float('-inf')),
+                          ([110] * 4, float('inf'))):
+            c = RunComparison(baseline, {LOAD_TIME: series(values)},
+                              resolution=1).compare(LOAD_TIME)
+            self.assertEqual(c.t, t)
+            self.assertEqual(c.p_value, 0.0)
+
+    def test_no_overlap(self):
+        baseline = {LOAD_TIME: series([1, 2])}
+        candidate = {LOAD_TIME: series([{'value': None}])}
+        c = RunComparison(baseline, candidate).compare(LOAD_TIME)
+        self.assertEqual(c.samples, 0)
+        self.assertFalse(c.regression)
+
+    def test_from_tests(self):
+        class MockTest(object):
+            def __init__(self, data):
+                self.data = data
+                self.fetched = None
+
+            def fetch_results(self, result_ids):
+                self.fetched = result_ids
+                return self.data
+
+        baseline = MockTest({LOAD_TIME: series([1, 2]),
+                             USERS: series([1, 2])})
+        candidate = MockTest({LOAD_TIME: series([1, 2]),
+                              USERS: series([1, 2])})
+        comparison = RunComparison.from_tests(
+            baseline, candidate, [LOAD_TIME], align='users',
+            users_result_id=USERS, resolution=1)
+        self.assertEqual(baseline.fetched, [LOAD_TIME, USERS])
+        self.assertEqual(comparison.compare(LOAD_TIME).delta, 0.0)
@@ -0,0 +1,87 @@
+# coding=utf-8
+
+"""
+Copyright 2015 Load Impact
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import unittest
+
+from loadimpact.derived import DerivedMetric, DerivedMetrics
+from loadimpact.resources import TestResult
+from loadimpact.rollups import Rollup
+from loadimpact.utils import optional_import
+
+S = TestResult.TIMESTAMP_RESOLUTION
+
+
+def points(values, start=0, jitter=0):
+    return [{'offset': i, 'timestamp': (start + i) * S + jitter, 'value': v}
+            for i, v in enumerate(values)]
+
+
+class TestDerivedDerivedMetric(unittest.TestCase):
+    def test_ratio(self):
+        metric = DerivedMetric.ratio('r', 'a', 'b', scale=2)
+        self.assertEqual(metric.inputs, ['a', 'b'])
+        self.assertEqual(metric.compute([[1, 2, 3], [4, 0, 2]]),
+                         [0.5, None, 3.0])
+
+    def test_product(self):
+        metric = DerivedMetric.product('p', 'a', 'b', scale=0.5)
+        self.assertEqual(metric.compute([[1, 2], [4, 3]]), [2.0, 3.0])
+
+    def test_compute_scalar(self):
+        metric = DerivedMetric('s', ['a', 'b', 'c'], lambda a, b, c: a + b + c)
+        self.assertEqual(metric.compute([[1], [2], [3]]), [6])
+
+    @unittest.skipIf(optional_import('numpy') is None, "NumPy not installed")
+    def test_compute_vectorized(self):
+        metric = DerivedMetric.ratio('r', 'a', 'b', scale=2)
+        self.assertEqual(metric.compute([[1, 2, 3, 0], [4, 0, 2, 0]]),
+                         [0.5, None, 3.0, None])
+
+
+class TestDerivedDerivedMetrics(unittest.TestCase):
+    def test_add(self):
+        pipeline = DerivedMetrics([DerivedMetric.ratio('r', 'a', 'b')])
+        self.assertEqual(pipeline.add({'a': points([2, 4, 6])}), {})
+        out = pipeline.add({'b': points([1, 2], jitter=S // 2)})
+        self.assertEqual(out, {'r': [
+            {'offset': 0, 'timestamp': 0, 'value': 2.0},
+            {'offset': 1, 'timestamp': S, 'value': 2.0}]})
+        out = pipeline.add({'b': points([3], start=2)})
+        self.assertEqual(out, {'r': [
+            {'offset': 2, 'timestamp': 2 * S, 'value': 2.0}]})
+        self.assertEqual(len(pipeline.series['r']), 3)
+
+    def test_add_exact_alignment(self):
+        pipeline = DerivedMetrics([DerivedMetric.ratio('r', 'a', 'b')],
+                                  resolution=0)
+        pipeline.add({'a': points([2, 4])})
+        out = pipeline.add({'b': points([1, 2], jitter=1)})
+        self.assertEqual(out, {})
+
+    def test_add_drops_unmatched(self):
+        pipeline = DerivedMetrics([DerivedMetric.ratio('r', 'a', 'b')])
+        pipeline.add({'a': points([1, 1, 1]), 'b': points([1], start=2)})
+        self.assertEqual(pipeline._aligners[0].pending, {'a': {}, 'b': {}})
+
+    def test_consume_feeds_consumers(self):
+        rollup = Rollup(resolutions=(0,))
+        pipeline = DerivedMetrics([DerivedMetric.product('p', 'a', 'b')],
+                                  consumers=[rollup])
+        pipeline.consume(None, {'a': points([1, 2]), 'b': points([3, 4])})
+        self.assertEqual([p['mean'] for p in rollup.series('p', 0)],
+                         [3.0, 8.0])
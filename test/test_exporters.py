@@ -0,0 +1,140 @@
+# coding=utf-8
+
+"""
+Copyright 2015 Load Impact
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+
+from loadimpact.exporters import PrometheusExporter, StatsdExporter
+from loadimpact.resources import TestResult
+
+try:
+    from urllib2 import urlopen
+except ImportError:
+    from urllib.request import urlopen
+
+
+LOAD_TIME = TestResult.result_id_from_name(TestResult.USER_LOAD_TIME,
+                                           load_zone_id=1)
+URL = TestResult.result_id_for_url('http://example.com/', 1, 2)
+
+
+class MockTest(object):
+    id = 1
+
+
+class MockStream(object):
+    test = MockTest()
+
+
+class TestExportersStatsdExporter(unittest.TestCase):
+    def setUp(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.listener.bind(('127.0.0.1', 0))
+        self.listener.settimeout(2)
+        self.exporter = StatsdExporter(
+            port=self.listener.getsockname()[1], host='127.0.0.1')
+
+    def tearDown(self):
+        self.exporter.close()
+        self.listener.close()
+
+    def receive(self):
+        return self.listener.recv(65536).decode('utf-8').split('\n')
+
+    def test_gauge_name(self):
+        self.assertEqual(self.exporter.gauge_name(1, LOAD_TIME),
+                         'loadimpact.test_1.user_load_time.zone_1')
+        self.assertEqual(self.exporter.gauge_name(1, URL),
+                         'loadimpact.test_1.url.%s.zone_1.scenario_2.200.GET'
+                         % TestResult.parse_result_id(URL).name_hash)
+
+    def test_consume_sends_latest_values(self):
+        self.exporter.consume(MockStream(), {
+            LOAD_TIME: [{'offset': 0, 'timestamp': 1, 'value': 1.5},
+                        {'offset': 1, 'timestamp': 2, 'value': 2.5}],
+            URL: [{'offset': 0, 'timestamp': 1, 'value': {'value': 3}}]
+        })
+        self.assertEqual(self.exporter.packets_sent, 1)
+        lines = sorted(self.receive())
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(lines[0],
+                         'loadimpact.test_1.url.%s.zone_1.scenario_2.200.GET'
+                         ':3|g' % TestResult.parse_result_id(URL).name_hash)
+        self.assertEqual(lines[1],
+                         'loadimpact.test_1.user_load_time.zone_1:2.5|g')
+
+    def test_send_negative_value_resets_gauge(self):
+        self.exporter.send(1, {LOAD_TIME: [{'value': -1}]})
+        self.assertEqual(self.receive(), [
+            'loadimpact.test_1.user_load_time.zone_1:0|g',
+            'loadimpact.test_1.user_load_time.zone_1:-1|g'])
+
+    def test_send_splits_packets(self):
+        self.exporter.max_packet_size = 60
+        self.exporter.send(1, {LOAD_TIME: [{'value': 1}], URL: [{'value': 2}],
+                               TestResult.LIVE_FEEDBACK: [{'value': 'x'}]})
+        self.assertEqual(self.exporter.packets_sent, 2)
+        self.assertEqual(len(self.receive()), 1)
+        self.assertEqual(len(self.receive()), 1)
+
+
+class TestExportersPrometheusExporter(unittest.TestCase):
+    def setUp(self):
+        self.exporter = PrometheusExporter()
+        self.exporter.update(1, {
+            LOAD_TIME: [{'value': 1}, {'value': 2}],
+            URL: [{'value': 3}]
+        })
+
+    def test_render(self):
+        name_hash = TestResult.parse_result_id(URL).name_hash
+        self.assertEqual(self.exporter.render(), '\n'.join([
+            '# TYPE loadimpact_url gauge',
+            'loadimpact_url{test_id="1",name_hash="%s",load_zone_id="1",'
+            'user_scenario_id="2",status_code="200",method="GET"} 3.0'
+            % name_hash,
+            '# TYPE loadimpact_user_load_time gauge',
+            'loadimpact_user_load_time{test_id="1",load_zone_id="1"} 2.0',
+            '']))
+
+    def test_render_empty(self):
+        self.assertEqual(PrometheusExporter().render(), '')
+
+    def test_consume_writes_textfile(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, 'loadimpact.prom')
+            exporter = PrometheusExporter(path=path)
+            exporter.consume(MockStream(), {LOAD_TIME: [{'value': 4}]})
+            with open(path) as f:
+                self.assertEqual(f.read(), exporter.render())
+            self.assertEqual(os.listdir(tmp), ['loadimpact.prom'])
+        finally:
+            shutil.rmtree(tmp)
+
+    def test_serve(self):
+        port = self.exporter.serve(port=0, host='127.0.0.1')
+        try:
+            response = urlopen('http://127.0.0.1:%d/metrics' % port)
+            self.assertEqual(response.read().decode('utf-8'),
+                             self.exporter.render())
+        finally:
+            self.exporter.shutdown()
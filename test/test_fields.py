@@ -75,6 +75,36 @@ class TestFieldsDateTimeField(unittest.TestCase):
 
     def test_coerce_bad_format(self):
         self.assertRaises(CoercionError, DateTimeField.coerce, '2013-01-01')
+        self.assertRaises(CoercionError, DateTimeField.coerce,
+                          '2013-01-01T10:00:00+1')
+        self.assertRaises(CoercionError, DateTimeField.coerce,
+                          '2013-01-01T10:00:00.+00:00')
+        self.assertRaises(CoercionError, DateTimeField.coerce,
+                          '2013-01-01T25:00:00+00:00')
+        self.assertRaises(CoercionError, DateTimeField.coerce, 1)
+
+    def test_coerce_offset(self):
+        expected = datetime(2015, 12, 4, 10, 0, 0, tzinfo=UTC())
+        for value in ['2015-12-04T10:00:00Z', '2015-12-04T10:00:00',
+                      '2015-12-04T11:30:00+01:30', '2015-12-04T05:00:00-0500',
+                      '2015-12-04 10:00:00+00:00']:
+            coerced = DateTimeField.coerce(value)
+            self.assertEqual(coerced, expected)
+            self.assertTrue(coerced.tzinfo is UTC())
+            self.assertEqual(coerced.hour, 10)
+
+    def test_coerce_fraction(self):
+        self.assertEqual(
+            DateTimeField.coerce('2015-12-04T10:00:00.25+00:00').microsecond,
+            250000)
+        self.assertEqual(
+            DateTimeField.coerce('2015-12-04T10:00:00.1234567Z').microsecond,
+            123456)
+
+    def test_coerce_cached(self):
+        value = '2015-12-04T10:00:00+00:00'
+        self.assertTrue(DateTimeField.coerce(value) is
+                        DateTimeField.coerce(value))
 
     def test_construct_bad_format(self):
         self.assertRaises(CoercionError, MockResource, self.client,
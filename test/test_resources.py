@@ -20,13 +20,18 @@ import hashlib
 import json
 import sys
 import unittest
+import weakref
 
+from datetime import datetime
+from loadimpact import resources
 from loadimpact.clients import Client
-from loadimpact.fields import IntegerField
+from loadimpact.exceptions import ResponseParseError
+from loadimpact.fields import Field, IntegerField, StringField
 from loadimpact.resources import (
-    DataStore, LoadZone, Resource, Test, TestConfig, TestResult,
+    DataStore, IdentityMap, LoadZone, Resource, Test, TestConfig, TestResult,
     _TestResultStream, UserScenario, UserScenarioValidation,
     _UserScenarioValidationResultStream)
+from loadimpact.utils import UTC
 
 
 class MockRequestsResponse(object):
@@ -67,6 +72,45 @@ class MockClient(Client):
                                     **nkwargs)
 
 
+class MockPayloadClient(Client):
+    """Responds to every request with the JSON payloads given, in order."""
+
+    def __init__(self, *payloads, **kwargs):
+        super(MockPayloadClient, self).__init__(**kwargs)
+        self.payloads = list(payloads)
+        self.requests = []
+
+    def _requests_request(self, method, url, **kwargs):
+        self.requests.append((method, url, kwargs.get('params'),
+                              kwargs.get('data')))
+        payload = self.payloads.pop(0)
+        response = MockRequestsResponse()
+        response.json = lambda: payload
+        return response
+
+
+class MockResultsClient(Client):
+    def __init__(self, data, page_size=2, status=Test.STATUS_FINISHED):
+        super(MockResultsClient, self).__init__()
+        self.data = data
+        self.page_size = page_size
+        self.status = status
+        self.requested_ids = []
+
+    def _requests_request(self, method, url, **kwargs):
+        if not url.endswith('/results'):
+            return MockRequestsResponse(id=1, status=self.status)
+        ids = kwargs['params']['ids']
+        self.requested_ids.append(ids)
+        body = {}
+        for q in ids.split(','):
+            rid, offset = q.split('|')
+            points = [p for p in self.data.get(rid, [])
+                      if p['offset'] > int(offset)]
+            body[rid] = points[:self.page_size]
+        return MockRequestsResponse(**body)
+
+
 class MockResource(Resource):
     fields = {}
     resource_name = 'resource'
@@ -84,6 +128,67 @@ class TestResourcesResource(unittest.TestCase):
             r.field2
         self.assertRaises(AttributeError, raises)
 
+    def test___setattr__(self):
+        r = MockResource(None, IntegerField, 0)
+        r.field = '1'
+        self.assertEqual(r.field, 1)
+
+        def raises():
+            r.field = 'x'
+        self.assertRaises(ValueError, raises)
+
+    def test___repr__(self):
+        r = MockResource(None, IntegerField, 1)
+        self.assertEqual(repr(r), "<MockResource>\n{'field': 1}")
+
+    def test_compact(self):
+        test = Test(None, id=1, title='Test')
+        self.assertFalse(hasattr(test, '__dict__'))
+        self.assertEqual(weakref.ref(test)(), test)
+
+        def raises():
+            test.foo = 1
+        self.assertRaises(AttributeError, raises)
+
+    def test_fields_added_to_slotted(self):
+        def raises():
+            Test.fields['extra'] = IntegerField
+        self.assertRaises(TypeError, raises)
+        self.assertFalse('extra' in Test.fields)
+        self.assertFalse(hasattr(Test, 'extra'))
+
+        class ExtendedTest(Test):
+            __slots__ = ()
+            fields = dict(Test.fields, extra=IntegerField)
+
+        test = ExtendedTest(None, id=1, extra='2')
+        self.assertEqual(test.extra, 2)
+        self.assertFalse(hasattr(test, '__dict__'))
+
+    def test_fields_schema(self):
+        MockResource(None, IntegerField, 1)
+        schema = MockResource.fields.schema
+        self.assertEqual(len(schema), 1)
+        self.assertEqual(schema[0][:3], ('field', '_f_field',
+                                         IntegerField.coerce))
+        self.assertTrue(MockResource.fields.schema is schema)
+
+        MockResource.fields['field'] = (StringField, Field.SERIALIZE)
+        schema = MockResource.fields.schema
+        self.assertEqual(schema[0][2], StringField.coerce)
+        self.assertEqual(schema[0][4], frozenset([Field.SERIALIZE]))
+
+    def test__set_fields_keeps_assigned(self):
+        test = Test(None, id=1, title='Test')
+        test.title = 'Changed'
+        test._set_fields({'id': 1})
+        self.assertEqual(test.title, 'Changed')
+        self.assertEqual(test.status, 0)
+        test._set_fields({'title': 'Synced'})
+        self.assertEqual(test.title, 'Synced')
+        test._set_fields({})
+        self.assertEqual(test.title, '')
+
     def test__path(self):
         self.assertEqual(MockResource._path(), MockResource.resource_name)
         self.assertEqual(MockResource._path(resource_id=None),
@@ -96,6 +201,230 @@ class TestResourcesResource(unittest.TestCase):
                          '%s/%s/%s' % (MockResource.resource_name, 1, 'action'))
 
 
+class TestResourcesIdentityMap(unittest.TestCase):
+    def test_get_and_list_share_instance(self):
+        client = MockPayloadClient(
+            {'id': 1, 'name': 'Config'},
+            [{'id': 1, 'name': 'Renamed'}, {'id': 2, 'name': 'Other'}],
+            identity_map=True)
+        test_config = client.get_test_config(1)
+        test_configs = client.list_test_configs()
+        self.assertTrue(test_configs[0] is test_config)
+        self.assertEqual(test_config.name, 'Renamed')
+        self.assertTrue(client.identity_map.get(TestConfig, 2)
+                        is test_configs[1])
+        self.assertEqual(len(client.identity_map), 2)
+
+    def test_keyed_by_class(self):
+        client = MockPayloadClient({'id': 1}, {'id': 1}, identity_map=True)
+        self.assertFalse(client.get_test_config(1) is
+                         client.get_user_scenario(1))
+
+    def test_weak_references(self):
+        client = MockPayloadClient({'id': 1}, identity_map=True)
+        test_config = client.get_test_config(1)
+        self.assertTrue((TestConfig, 1) in client.identity_map)
+        del test_config
+        self.assertFalse((TestConfig, 1) in client.identity_map)
+
+    def test_delete_discards(self):
+        client = MockPayloadClient({'id': 1}, {}, identity_map=True)
+        test_config = client.get_test_config(1)
+        test_config.delete()
+        self.assertEqual(client.identity_map.get(TestConfig, 1), None)
+
+    def test_merge_keeps_pending_edits(self):
+        client = MockPayloadClient(
+            {'id': 1, 'name': 'Config', 'config': {'a': 1}},
+            [{'id': 1, 'name': 'Server', 'url': 'http://example.com/',
+              'config': {'a': 3}}],
+            identity_map=True)
+        test_config = client.get_test_config(1)
+        test_config.name = 'Local edit'
+        test_config.config['a'] = 2
+        client.list_test_configs()
+        self.assertEqual(test_config.name, 'Local edit')
+        self.assertEqual(test_config.config, {'a': 2})
+        self.assertEqual(test_config.url, 'http://example.com/')
+        self.assertEqual(sorted(test_config.changed_fields()),
+                         ['config', 'name'])
+
+    def test_normalized_ids(self):
+        client = MockPayloadClient({'id': 5}, {}, identity_map=True)
+        test_config = client.get_test_config('5')
+        self.assertTrue(client.identity_map.get(TestConfig, '5')
+                        is test_config)
+        self.assertTrue((TestConfig, '5') in client.identity_map)
+        TestConfig.delete_with_id(client, '5')
+        self.assertFalse((TestConfig, 5) in client.identity_map)
+
+    def test_without_identity_map(self):
+        client = MockPayloadClient({'id': 1}, {'id': 1})
+        self.assertEqual(client.identity_map, None)
+        self.assertFalse(client.get_test_config(1) is
+                         client.get_test_config(1))
+
+    def test_load_without_id(self):
+        identity_map = IdentityMap()
+        test_config = identity_map.load(TestConfig, None, {'name': 'a'})
+        self.assertEqual(test_config.name, 'a')
+        self.assertEqual(len(identity_map), 0)
+
+
+class TestResourcesListMixin(unittest.TestCase):
+    def _pages(self, *sizes):
+        pages, i = [], 0
+        for size in sizes:
+            pages.append([{'id': i + j} for j in range(size)])
+            i += size
+        return pages
+
+    def test_list_pages(self):
+        client = MockPayloadClient(*self._pages(2, 2, 1))
+        tests = client.list_tests(page_size=2)
+        self.assertEqual(client.requests, [])
+        self.assertEqual([t.id for t in tests], [0, 1, 2, 3, 4])
+        self.assertEqual([r[2] for r in client.requests], [
+            {'page': 1, 'page_size': 2}, {'page': 2, 'page_size': 2},
+            {'page': 3, 'page_size': 2}])
+
+    def test_list_pages_early_termination(self):
+        for prefetch in (True, False):
+            client = MockPayloadClient(*self._pages(2, 2, 2, 2))
+            tests = client.list_tests(page_size=2, prefetch=prefetch)
+            self.assertEqual(next(tests).id, 0)
+            self.assertEqual(next(tests).id, 1)
+            del tests
+            # At most the page prefetched while iterating the first one.
+            self.assertTrue(len(client.requests) <= (2 if prefetch else 1))
+
+    def test_list_pages_limit(self):
+        client = MockPayloadClient(*self._pages(2, 2, 2))
+        tests = client.list_tests(page_size=2, page=2, limit=3)
+        self.assertEqual([t.id for t in tests], [0, 1, 2])
+        self.assertEqual([r[2]['page'] for r in client.requests], [2, 3])
+
+    def test_list_pages_ignored(self):
+        client = MockPayloadClient(*(self._pages(2) * 2))
+        tests = client.list_tests(page_size=2, prefetch=False)
+        self.assertEqual([t.id for t in tests], [0, 1])
+
+        client = MockPayloadClient(*self._pages(5))
+        tests = client.list_tests(page_size=2)
+        self.assertEqual([t.id for t in tests], [0, 1, 2, 3, 4])
+        self.assertEqual(len(client.requests), 1)
+
+    def test_list_pages_parse_error(self):
+        client = MockPayloadClient([{'id': 'x'}])
+        tests = client.list_tests(page_size=2)
+        self.assertRaises(ResponseParseError, next, tests)
+
+
+class TestResourcesFilters(unittest.TestCase):
+    def _configs(self):
+        return [
+            {'id': 1, 'name': 'Nightly A', 'created': '2015-12-01T00:00:00'},
+            {'id': 2, 'name': 'Release', 'created': '2015-12-02T00:00:00'},
+            {'id': 3, 'name': 'Nightly B', 'created': '2015-12-03T00:00:00'},
+            {'id': 4, 'name': 'Nightly C', 'created': None}
+        ]
+
+    def test_list_filters_params(self):
+        client = MockPayloadClient([])
+        client.list_tests(status=[Test.STATUS_RUNNING, Test.STATUS_QUEUED],
+                          started__gte=datetime(2015, 12, 1))
+        self.assertEqual(client.requests[0][2], {
+            'status': '%d,%d' % (Test.STATUS_RUNNING, Test.STATUS_QUEUED),
+            'started__gte': '2015-12-01T00:00:00+00:00'})
+
+    def test_list_filters_local_fallback(self):
+        client = MockPayloadClient(self._configs())
+        configs = client.list_test_configs(
+            name__contains='Nightly',
+            created__gte=datetime(2015, 12, 2, tzinfo=UTC()))
+        self.assertEqual([c.id for c in configs], [3])
+
+        client = MockPayloadClient(self._configs())
+        configs = client.list_test_configs(name='Release')
+        self.assertEqual([c.id for c in configs], [2])
+
+    def test_list_filters_paginated(self):
+        client = MockPayloadClient(self._configs()[:2], self._configs()[2:])
+        configs = client.list_test_configs(page_size=2, limit=2,
+                                           name__contains='Nightly')
+        self.assertEqual([c.id for c in configs], [1, 3])
+        self.assertEqual(client.requests[1][2], {
+            'name__contains': 'Nightly', 'page': 2, 'page_size': 2})
+
+    def test_list_filters_selected_fields(self):
+        # The API honours the field selection but ignores the filters.
+        client = MockPayloadClient([
+            {'id': 1, 'title': 'A', 'status': Test.STATUS_RUNNING},
+            {'id': 2, 'title': 'B', 'status': Test.STATUS_FINISHED}])
+        tests = client.list_tests(status=Test.STATUS_RUNNING,
+                                  fields=['title'])
+        self.assertEqual(client.requests[0][2], {
+            'status': Test.STATUS_RUNNING, 'fields': 'id,title,status'})
+        self.assertEqual([t.id for t in tests], [1])
+
+    def test_list_filters_invalid(self):
+        client = MockPayloadClient([])
+        self.assertRaises(ValueError, client.list_tests, nope=1)
+        self.assertRaises(ValueError, client.list_tests, status__near=1)
+        self.assertRaises(ValueError, client.list_tests, status='x')
+        self.assertEqual(client.requests, [])
+
+    def test_get_fields(self):
+        client = MockPayloadClient(
+            {'id': 1, 'name': 'Config', 'config': {'a': 1}},
+            {'id': 1, 'name': 'Renamed', 'config': {'a': 2}},
+            identity_map=True)
+        test_config = client.get_test_config(1)
+        same = client.get_test_config(1, fields=['name'])
+        self.assertTrue(same is test_config)
+        self.assertEqual(client.requests[1][2], {'fields': 'id,name'})
+        self.assertEqual(test_config.name, 'Renamed')
+        self.assertEqual(test_config.config, {'a': 1})
+        self.assertRaises(ValueError, client.get_test_config, 1,
+                          fields=['nope'])
+
+    def test_update_partially_loaded(self):
+        client = MockPayloadClient({'id': 1, 'name': 'Config'}, {})
+        test_config = client.get_test_config(1, fields=['name'])
+        self.assertEqual(test_config.unloaded_fields(),
+                         ['config', 'created', 'public_url', 'updated',
+                          'url'])
+        test_config.name = 'New'
+        test_config.update()
+        self.assertEqual(json.loads(client.requests[1][3]), {'name': 'New'})
+
+        client = MockPayloadClient({'id': 1, 'name': 'Config'}, {})
+        test_config = client.get_test_config(1, fields=['name'])
+        test_config.url = 'http://example.com/'
+        test_config.update()
+        self.assertEqual(json.loads(client.requests[1][3]), {
+            'name': 'Config', 'url': 'http://example.com/'})
+
+    def test_merge_completes_partial_load(self):
+        client = MockPayloadClient(
+            {'id': 1, 'name': 'Config'},
+            [{'id': 1, 'name': 'Config', 'url': 'u', 'config': {}}],
+            identity_map=True)
+        test_config = client.get_test_config(1, fields=['name'])
+        client.list_test_configs(fields=['url', 'config'])
+        self.assertEqual(test_config.unloaded_fields(),
+                         ['created', 'public_url', 'updated'])
+        client.identity_map.load(TestConfig, client, {'id': 1})
+        self.assertEqual(test_config.unloaded_fields(), [])
+
+    def test_list_fields(self):
+        client = MockPayloadClient(self._configs())
+        configs = client.list_test_configs(fields=['name'])
+        self.assertEqual(client.requests[0][2], {'fields': 'id,name'})
+        self.assertEqual(configs[0].name, 'Nightly A')
+        self.assertEqual(configs[0].url, '')
+
+
 class TestResourcesDataStore(unittest.TestCase):
     def setUp(self):
         self.client = MockClient()
@@ -176,6 +505,46 @@ class TestResourcesTest(unittest.TestCase):
         self.assertEqual(client.last_request_method, 'post')
         self.assertFalse(result)
 
+    def test_get_lazy(self):
+        client = MockClient(response_body={
+            'id': '1', 'title': 'Test', 'started': 'not a date'})
+        test = Test.get(client, 1, lazy=True)
+        self.assertEqual(test.id, 1)
+        self.assertEqual(test.title, 'Test')
+        self.assertRaises(ResponseParseError, lambda: test.started)
+        self.assertRaises(ResponseParseError, test.validate_fields)
+        self.assertRaises(ResponseParseError, Test.get, client, 1)
+
+    def test_set_fields_lazy(self):
+        test = Test(self.client)
+        test._set_fields({'id': '1', 'started': '2015-12-04T10:00:00+00:00'},
+                         lazy=True)
+        started = test.started
+        self.assertEqual(started.year, 2015)
+        self.assertTrue(test.started is started)
+        self.assertEqual(test.id, 1)
+        test.validate_fields()
+
+    def test_fetch_results(self):
+        data = {
+            'a': [{'offset': i, 'value': i} for i in range(5)],
+            'b': [{'offset': i, 'value': i} for i in range(3)],
+            'c': []
+        }
+        client = MockResultsClient(data)
+        test = Test(client, id=1)
+        self.assertEqual(test.fetch_results(['a', 'b', 'c']), data)
+        self.assertEqual(sorted(client.requested_ids),
+                         ['a|-1', 'a|1', 'a|3', 'a|4', 'b|-1', 'b|1', 'b|2',
+                          'c|-1'])
+
+    def test_fetch_results_with_offsets(self):
+        data = {'a': [{'offset': i, 'value': i} for i in range(5)]}
+        client = MockResultsClient(data)
+        test = Test(client, id=1)
+        self.assertEqual(test.fetch_results(['a'], offsets={'a': 2}),
+                         {'a': data['a'][3:]})
+
     def test_is_done(self):
         test = Test(self.client)
         self.assertFalse(test.is_done())
@@ -302,6 +671,127 @@ class TestResourcesTestResult(unittest.TestCase):
         self.assertEqual(result_id, '__li_url_%s:1:1:200:GET'
                                     % hashlib.md5(url).hexdigest())
 
+    def test_result_id_for_url_unicode(self):
+        url = u'http://example.com/\u00e5'
+        result_id = TestResult.result_id_for_url(url, 1, 1)
+        self.assertEqual(result_id, '__li_url_%s:1:1:200:GET'
+                                    % hashlib.md5(url.encode('utf-8'))
+                                    .hexdigest())
+
+    def test_parse_result_id(self):
+        key = TestResult.parse_result_id('__li_user_load_time:1:2')
+        self.assertEqual(key, ('standard', '__li_user_load_time', None, None,
+                               1, 2, None, None))
+        key = TestResult.parse_result_id(TestResult.LIVE_FEEDBACK)
+        self.assertEqual(key.metric, TestResult.LIVE_FEEDBACK)
+        self.assertEqual(key.load_zone_id, None)
+
+    def test_parse_result_id_hashed(self):
+        url = 'http://example.com/parse'
+        digest = hashlib.md5(url.encode('utf-8')).hexdigest()
+        result_id = '__li_url_%s:13:42:200:GET' % digest
+        key = TestResult.parse_result_id(result_id)
+        self.assertEqual(key, ('url', '__li_url_', digest, None, 13, 42, 200,
+                               'GET'))
+        TestResult.register_name(url)
+        self.assertEqual(TestResult.parse_result_id(result_id).name, url)
+        key = TestResult.parse_result_id(
+            TestResult.result_id_for_page('my page', 1, 2))
+        self.assertEqual((key.kind, key.name), ('page', 'my page'))
+
+    def test_digest_names_bounded(self):
+        maxsize = resources._digest_names.maxsize
+        resources._digest_names.maxsize = 2
+        try:
+            for name in ('bounded a', 'bounded b', 'bounded c'):
+                TestResult.register_name(name)
+            self.assertEqual(len(resources._digest_names), 2)
+            key = TestResult.parse_result_id(
+                TestResult.result_id_for_page('bounded a', 1, 2))
+            self.assertEqual(key.name, None)
+            key = TestResult.parse_result_id(
+                TestResult.result_id_for_page('bounded c', 1, 2))
+            self.assertEqual(key.name, 'bounded c')
+        finally:
+            resources._digest_names.maxsize = maxsize
+
+    def test_result_ids_from_custom_metric_names(self):
+        result_ids = TestResult.result_ids_from_custom_metric_names(
+            ['m1', 'm2'], [1, 11], [7])
+        self.assertEqual(result_ids, [
+            TestResult.result_id_from_custom_metric_name('m1', 1, 7),
+            TestResult.result_id_from_custom_metric_name('m1', 11, 7),
+            TestResult.result_id_from_custom_metric_name('m2', 1, 7),
+            TestResult.result_id_from_custom_metric_name('m2', 11, 7)])
+
+    def test_result_ids_for_pages(self):
+        result_ids = TestResult.result_ids_for_pages(['p1'], [1], [7, 8])
+        self.assertEqual(result_ids, [
+            TestResult.result_id_for_page('p1', 1, 7),
+            TestResult.result_id_for_page('p1', 1, 8)])
+
+    def test_result_ids_for_urls(self):
+        urls = ['http://example.com/', 'http://example.com/a']
+        result_ids = TestResult.result_ids_for_urls(
+            urls, [1, 11], [7], methods=['GET', 'POST'],
+            status_codes=[200, 404])
+        self.assertEqual(len(result_ids), 16)
+        self.assertEqual(result_ids[:4], [
+            TestResult.result_id_for_url(urls[0], 1, 7, 'GET', 200),
+            TestResult.result_id_for_url(urls[0], 1, 7, 'POST', 200),
+            TestResult.result_id_for_url(urls[0], 1, 7, 'GET', 404),
+            TestResult.result_id_for_url(urls[0], 1, 7, 'POST', 404)])
+        self.assertEqual(result_ids[-1], TestResult.result_id_for_url(
+            urls[1], 11, 7, 'POST', 404))
+
+
+class TestResourcesTestResultStream(unittest.TestCase):
+    def test_is_done(self):
+        client = MockResultsClient({'a': [{'offset': 0, 'value': 0}]},
+                                   status=Test.STATUS_RUNNING)
+        stream = Test(client, id=1).result_stream(['a'])
+        self.assertFalse(stream.is_done())
+        polls = stream(poll_rate=0)
+        next(polls)
+        self.assertFalse(stream.is_done())
+        client.data['a'].append({'offset': 1, 'value': 1})
+        next(polls)
+        self.assertFalse(stream.is_done())
+        self.assertEqual(stream.watermarks, {'a': 1})
+        self.assertEqual(stream.progress, 2)
+
+    def test_stream_ends_when_data_stops_advancing(self):
+        client = MockResultsClient(
+            {'a': [{'offset': i, 'value': i} for i in range(5)]},
+            page_size=10)
+        stream = Test(client, id=1).result_stream(['a'])
+        changes = list(stream(poll_rate=0, post_polls=0))
+        self.assertEqual(changes, [{'a': {'offset': 4, 'value': 4}}])
+        self.assertTrue(stream.is_done())
+        self.assertEqual(stream.watermarks, {'a': 4})
+        self.assertEqual(stream.last('a'), {'offset': 4, 'value': 4})
+        self.assertEqual(client.requested_ids, ['a|-1', 'a|4', 'a|4'])
+
+    def test_overlapping_batches_are_deduplicated(self):
+        client = MockResultsClient({}, status=Test.STATUS_RUNNING)
+        stream = Test(client, id=1).result_stream(['a'])
+        batches = [
+            [{'offset': 0}, {'offset': 1}, {'offset': 2}],
+            [{'offset': 1}, {'offset': 2}, {'offset': 3}],
+            [{'offset': 3}, {'offset': 5}, {'offset': 4}],
+            [{'offset': 2}]
+        ]
+        client._requests_request = lambda method, url, **kwargs: \
+            MockRequestsResponse(a=batches.pop(0))
+        polls = stream(poll_rate=0)
+        self.assertEqual(next(polls), {'a': {'offset': 2}})
+        self.assertEqual(next(polls), {'a': {'offset': 3}})
+        self.assertEqual(next(polls), {'a': {'offset': 5}})
+        self.assertEqual(stream.series['a'],
+                         [{'offset': i} for i in (0, 1, 2, 3, 5)])
+        self.assertEqual(stream.watermarks, {'a': 5})
+        self.assertEqual(stream.duplicates, {'a': 4})
+
 
 class TestResourcesTestConfig(unittest.TestCase):
     def setUp(self):
@@ -362,6 +852,64 @@ class TestResourcesTestConfig(unittest.TestCase):
                          'application/json')
         self.assertEqual(test_config.name, name_change)
 
+    def _get_test_config(self):
+        client = MockClient(response_body={
+            'id': 1, 'name': 'Config', 'url': 'http://example.com/',
+            'config': {'load_schedule': [{'users': 10, 'duration': 10}]}
+        })
+        return client, client.get_test_config(1)
+
+    def test_update_unchanged(self):
+        client, test_config = self._get_test_config()
+        self.assertEqual(test_config.changed_fields(), [])
+        test_config.name = 'Config'
+        client.last_request_method = None
+        test_config.update()
+        self.assertEqual(client.last_request_method, None)
+
+    def _update_partial(self, test_config):
+        TestConfig.update_partial = True
+        try:
+            test_config.update()
+        finally:
+            del TestConfig.update_partial
+
+    def test_update_changed(self):
+        client, test_config = self._get_test_config()
+        test_config.name = 'Renamed'
+        test_config.update()
+        self.assertEqual(client.last_request_method, 'put')
+        self.assertEqual(sorted(client.last_request_kwargs['data']),
+                         ['config', 'name', 'url'])
+        self.assertEqual(client.last_request_kwargs['data']['name'],
+                         'Renamed')
+        self.assertEqual(test_config.changed_fields(), [])
+
+    def test_update_partial(self):
+        client, test_config = self._get_test_config()
+        test_config.name = 'Renamed'
+        self._update_partial(test_config)
+        self.assertEqual(client.last_request_kwargs['data'],
+                         {'name': 'Renamed'})
+        self.assertEqual(test_config.changed_fields(), [])
+
+    def test_update_partial_in_place_change(self):
+        client, test_config = self._get_test_config()
+        test_config.config['load_schedule'][0]['users'] = 20
+        self.assertEqual(test_config.changed_fields(), ['config'])
+        self._update_partial(test_config)
+        self.assertEqual(sorted(client.last_request_kwargs['data']),
+                         ['config'])
+
+    def test_update_lazy_in_place_change(self):
+        client = MockClient(response_body={'id': 1, 'config': {'a': 1}})
+        test_config = client.get_test_config(1, lazy=True)
+        self.assertEqual(test_config.changed_fields(), [])
+        test_config.config['a'] = 2
+        test_config.url = 'http://example.com/'
+        self.assertEqual(sorted(test_config.changed_fields()),
+                         ['config', 'url'])
+
 
 class TestResourcesUserScenario(unittest.TestCase):
     def setUp(self):
@@ -461,3 +1009,81 @@ class TestResourcesUserScenarioValidation(unittest.TestCase):
         validation.status = status
         self.assertEqual(validation.is_done(), expected)
         self.assertEqual(self.client.last_request_method, 'get')
+
+
+class MockValidationClient(Client):
+    def __init__(self, bodies):
+        super(MockValidationClient, self).__init__()
+        self.bodies = list(bodies)
+        self.requests = 0
+
+    def _requests_request(self, method, url, **kwargs):
+        if not url.endswith('/results'):
+            return MockRequestsResponse(
+                id=1, status=UserScenarioValidation.STATUS_FINISHED)
+        self.requests += 1
+        return MockRequestsResponse(**self.bodies.pop(0))
+
+
+class TestResourcesUserScenarioValidationResultStream(unittest.TestCase):
+    def setUp(self):
+        self.sleeps = []
+        self._sleep = resources.sleep
+        resources.sleep = self.sleeps.append
+
+    def tearDown(self):
+        resources.sleep = self._sleep
+
+    def _stream(self, bodies, **kwargs):
+        client = MockValidationClient(bodies)
+        validation = UserScenarioValidation(client, id=1)
+        return client, validation.result_stream(**kwargs)
+
+    def _results(self, *offsets):
+        return [{'offset': i, 'timestamp': i, 'message': 'line %d' % i}
+                for i in offsets]
+
+    def test_backoff(self):
+        running = UserScenarioValidation.STATUS_RUNNING
+        client, stream = self._stream([
+            {'status': running},
+            {'status': running},
+            {'status': running, 'results': []},
+            {'status': running},
+            {'status': running, 'results': self._results(0)},
+            {'status': running},
+            {'status': UserScenarioValidation.STATUS_FINISHED}
+        ])
+        results = list(stream(poll_rate=1, max_poll_rate=5, backoff=2))
+        self.assertEqual(len(results), 1)
+        self.assertEqual(client.requests, 7)
+        self.assertEqual(self.sleeps, [1, 2, 4, 5, 1, 1])
+
+    def test_backoff_minimum(self):
+        running = UserScenarioValidation.STATUS_RUNNING
+        _, stream = self._stream([
+            {'status': running},
+            {'status': running},
+            {'status': running, 'results': self._results(0)},
+            {'status': UserScenarioValidation.STATUS_FINISHED}
+        ])
+        list(stream(poll_rate=0, max_poll_rate=0))
+        self.assertEqual(self.sleeps, [0.5, 0.5, 0])
+
+    def test_retention(self):
+        finished = UserScenarioValidation.STATUS_FINISHED
+        _, stream = self._stream([
+            {'results': self._results(0, 1)},
+            {'results': self._results(2), 'status': finished}
+        ], max_results=2)
+        self.assertEqual(len(list(stream(poll_rate=0))), 3)
+        self.assertEqual([r['offset'] for r in stream.results], [1, 2])
+        self.assertEqual(stream.last_offset, 2)
+
+    def test_retention_disabled(self):
+        _, stream = self._stream([
+            {'results': self._results(0),
+             'status': UserScenarioValidation.STATUS_FINISHED}
+        ], max_results=0)
+        self.assertEqual(len(list(stream(poll_rate=0))), 1)
+        self.assertEqual(list(stream.results), [])
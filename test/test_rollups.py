@@ -0,0 +1,90 @@
+# coding=utf-8
+
+"""
+Copyright 2015 Load Impact
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import unittest
+
+from loadimpact.resources import TestResult
+from loadimpact.rollups import Rollup
+
+S = TestResult.TIMESTAMP_RESOLUTION
+
+
+def points(values, step=1):
+    return [{'offset': i, 'timestamp': i * step * S, 'value': v}
+            for i, v in enumerate(values)]
+
+
+class TestRollupsRollup(unittest.TestCase):
+    def test_series_raw(self):
+        rollup = Rollup(resolutions=(0, 10))
+        rollup.add({'a': points([1, 2, 3])})
+        self.assertEqual(rollup.series('a', 0), [
+            {'timestamp': 0, 'min': 1, 'max': 1, 'mean': 1.0, 'count': 1},
+            {'timestamp': S, 'min': 2, 'max': 2, 'mean': 2.0, 'count': 1},
+            {'timestamp': 2 * S, 'min': 3, 'max': 3, 'mean': 3.0,
+             'count': 1}])
+
+    def test_series_buckets(self):
+        rollup = Rollup(resolutions=(0, 10))
+        rollup.add({'a': points(range(25))})
+        self.assertEqual(rollup.series('a', 10), [
+            {'timestamp': 0, 'min': 0, 'max': 9, 'mean': 4.5, 'count': 10},
+            {'timestamp': 10 * S, 'min': 10, 'max': 19, 'mean': 14.5,
+             'count': 10},
+            {'timestamp': 20 * S, 'min': 20, 'max': 24, 'mean': 22.0,
+             'count': 5}])
+
+    def test_series_incremental_and_out_of_order(self):
+        rollup = Rollup(resolutions=(10,))
+        data = points(range(30))
+        rollup.add({'a': data[20:]})
+        rollup.add({'a': data[:5]})
+        rollup.add({'a': data[5:20]})
+        self.assertEqual([b['count'] for b in rollup.series('a', 10)],
+                         [10, 10, 10])
+
+    def test_series_range(self):
+        rollup = Rollup(resolutions=(10,))
+        rollup.add({'a': points(range(50))})
+        self.assertEqual(
+            [b['timestamp'] for b in rollup.series('a', 10, start=10 * S,
+                                                   end=30 * S)],
+            [10 * S, 20 * S, 30 * S])
+
+    def test_series_unknown_resolution(self):
+        rollup = Rollup(resolutions=(10,))
+        self.assertRaises(ValueError, rollup.series, 'a', 60)
+
+    def test_series_unknown_result(self):
+        self.assertEqual(Rollup().series('a', 10), [])
+        self.assertEqual(Rollup().query('a'), [])
+
+    def test_query(self):
+        rollup = Rollup()
+        rollup.add({'a': points(range(3600))})
+        self.assertEqual(len(rollup.query('a', max_points=5000)), 3600)
+        self.assertEqual(len(rollup.query('a', max_points=500)), 360)
+        self.assertEqual(len(rollup.query('a', max_points=60)), 60)
+        self.assertEqual(len(rollup.query('a', max_points=2)), 6)
+
+    def test_skips_non_numeric(self):
+        rollup = Rollup(resolutions=(10,))
+        rollup.add({'a': [
+            {'offset': 0, 'timestamp': 0, 'value': 'text'},
+            {'offset': 1, 'timestamp': 0, 'value': {'value': 2}}]})
+        self.assertEqual([b['count'] for b in rollup.series('a', 10)], [1])
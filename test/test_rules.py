@@ -0,0 +1,133 @@
+# coding=utf-8
+
+"""
+Copyright 2015 Load Impact
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import unittest
+
+from loadimpact.rules import Rule, RuleEngine
+from loadimpact.resources import TestResult
+
+S = TestResult.TIMESTAMP_RESOLUTION
+
+
+class MockTest(object):
+    id = 1
+
+    def __init__(self):
+        self.aborts = 0
+
+    def abort(self):
+        self.aborts += 1
+        return True
+
+
+class MockStream(object):
+    def __init__(self):
+        self.test = MockTest()
+
+
+def points(values, step=1):
+    return [{'offset': i, 'timestamp': i * step * S, 'value': v}
+            for i, v in enumerate(values)]
+
+
+class TestRulesRule(unittest.TestCase):
+    def test_parse(self):
+        rule = Rule.parse('FAILURE_RATE:1 > 5% for 60s')
+        self.assertEqual(rule.result_id, '__li_failure_rate:1')
+        self.assertEqual(rule.op, '>')
+        self.assertEqual(rule.threshold, 5.0)
+        self.assertEqual(rule.aggregation, 'value')
+        self.assertEqual(rule.duration, 60.0)
+        self.assertEqual(rule.name, 'FAILURE_RATE:1 > 5% for 60s')
+
+    def test_parse_aggregation(self):
+        rule = Rule.parse('p95(__li_user_load_time:1) >= 3000 over 30s')
+        self.assertEqual(rule.result_id, '__li_user_load_time:1')
+        self.assertEqual(rule.aggregation, 'p95')
+        self.assertEqual(rule.percentile, 95.0)
+        self.assertEqual(rule.window, 30.0)
+
+    def test_parse_invalid(self):
+        self.assertRaises(ValueError, Rule.parse, 'FAILURE_RATE:1 ~ 5')
+        self.assertRaises(ValueError, Rule.parse, 'avg(FAILURE_RATE:1) > 5')
+
+    def test_value_for_duration(self):
+        rule = Rule('a', '>', 5, duration=2)
+        events = [rule.evaluate(p['timestamp'], p['value'])
+                  for p in points([6, 6, 6, 6, 1])]
+        self.assertEqual([e and e.kind for e in events],
+                         [None, None, 'fired', None, 'resolved'])
+
+    def test_breach_interrupted(self):
+        rule = Rule('a', '>', 5, duration=2)
+        events = [rule.evaluate(p['timestamp'], p['value'])
+                  for p in points([6, 6, 1, 6, 6])]
+        self.assertEqual(events, [None] * 5)
+
+    def test_window_aggregations(self):
+        values = [5, 1, 9, 3, 7, 2]
+        for aggregation, expected in [('mean', 4.0), ('min', 2), ('max', 7),
+                                      ('count', 3), ('sum', 12.0),
+                                      ('p50', 3)]:
+            rule = Rule('a', '>', 1000, aggregation=aggregation, window=2)
+            for p in points(values):
+                event = rule.evaluate(p['timestamp'], p['value'])
+            rule.threshold = -1
+            event = rule.evaluate(6 * S, 3)
+            self.assertEqual(event.value, expected, aggregation)
+
+    def test_window_percentile(self):
+        values = [(i * 7) % 11 for i in range(50)]
+        rule = Rule('a', '<', -1, aggregation='p90', window=5)
+        for i, p in enumerate(points(values)):
+            rule.evaluate(p['timestamp'], p['value'])
+            window = sorted(values[max(0, i - 5):i + 1])
+            self.assertEqual(rule._window.percentile(),
+                             window[int(round(0.9 * (len(window) - 1)))])
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, Rule, 'a', '!=', 5)
+        self.assertRaises(ValueError, Rule, 'a', '>', 5, aggregation='median')
+        self.assertRaises(ValueError, Rule, 'a', '>', 5, aggregation='p101')
+
+
+class TestRulesRuleEngine(unittest.TestCase):
+    def test_consume(self):
+        events = []
+        engine = RuleEngine(['a > 5'], listeners=[events.append])
+        stream = MockStream()
+        engine.consume(stream, {'a': points([1, 6]), 'b': points([10])})
+        self.assertEqual(len(events), 1)
+        self.assertEqual(events[0].kind, 'fired')
+        self.assertEqual(events[0].timestamp, S)
+        self.assertEqual(engine.events, events)
+        self.assertEqual(stream.test.aborts, 0)
+
+    def test_consume_skips_non_numeric(self):
+        engine = RuleEngine(['a > 5'])
+        engine.consume(MockStream(), {'a': [{'offset': 0, 'timestamp': 0,
+                                             'value': 'text'}]})
+        self.assertEqual(engine.events, [])
+
+    def test_abort(self):
+        engine = RuleEngine([Rule.parse('a > 5', abort=True)])
+        stream = MockStream()
+        engine.consume(stream, {'a': points([6, 1, 6])})
+        self.assertEqual(len(engine.events), 3)
+        self.assertTrue(engine.aborted)
+        self.assertEqual(stream.test.aborts, 1)
@@ -0,0 +1,187 @@
+# coding=utf-8
+
+"""
+Copyright 2015 Load Impact
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+from loadimpact.resources import TestResult
+from loadimpact.sinks import (
+    CSVSink, JSONLinesSink, ParquetSink, to_arrow_table)
+from loadimpact.utils import optional_import
+
+
+def points(n, start=0):
+    return [{'offset': i, 'timestamp': 1000 * i, 'value': float(i)}
+            for i in range(start, start + n)]
+
+
+def read_lines(path, compress=False):
+    f = gzip.open(path, 'rb') if compress else open(path, 'rb')
+    try:
+        return f.read().decode('utf-8').splitlines()
+    finally:
+        f.close()
+
+
+class MockTest(object):
+    id = 1
+
+
+class MockStream(object):
+    test = MockTest()
+
+
+class TestSinksJSONLinesSink(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'results.jsonl')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_write(self):
+        with JSONLinesSink(self.path) as sink:
+            sink.write(1, {'a': points(2)})
+        lines = [json.loads(l) for l in read_lines(self.path)]
+        self.assertEqual(lines, [
+            {'test_id': 1, 'result_id': 'a', 'offset': 0, 'timestamp': 0,
+             'value': 0.0},
+            {'test_id': 1, 'result_id': 'a', 'offset': 1, 'timestamp': 1000,
+             'value': 1.0}])
+        self.assertEqual(sink.rows_written, 2)
+
+    def test_buffering(self):
+        sink = JSONLinesSink(self.path, buffer_size=1024 * 1024)
+        sink.write(1, {'a': points(10)})
+        self.assertFalse(os.path.exists(self.path))
+        sink.flush()
+        self.assertEqual(len(read_lines(self.path)), 10)
+        sink.close()
+
+    def test_consume_and_finish(self):
+        sink = JSONLinesSink(self.path)
+        sink.consume(MockStream(), {'a': points(3)})
+        sink.finish(MockStream())
+        sink.consume(MockStream(), {'a': points(1, start=3)})
+        sink.close()
+        self.assertEqual([json.loads(l)['offset']
+                          for l in read_lines(self.path)], [0, 1, 2, 3])
+
+    def test_rotation(self):
+        sink = JSONLinesSink(self.path, buffer_size=1, rotate_bytes=200)
+        for i in range(10):
+            sink.write(1, {'a': points(1, start=i)})
+        sink.close()
+        self.assertTrue(sink.rotated)
+        offsets = []
+        for path in sink.rotated + [self.path]:
+            offsets.extend(json.loads(l)['offset'] for l in read_lines(path))
+        self.assertEqual(offsets, list(range(10)))
+
+    def test_compress(self):
+        with JSONLinesSink(self.path, compress=True, fsync_every=1) as sink:
+            sink.write(1, {'a': points(5)})
+        self.assertEqual(len(read_lines(self.path, compress=True)), 5)
+
+
+class TestSinksCSVSink(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'results.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_write(self):
+        with CSVSink(self.path) as sink:
+            sink.write(1, {'a': points(1)})
+            sink.write(1, {'b': [{'offset': 0, 'timestamp': 0,
+                                  'value': {'message': 'x, y'}}]})
+        self.assertEqual(read_lines(self.path), [
+            'test_id,result_id,offset,timestamp,value',
+            '1,a,0,0,0.0',
+            '1,b,0,0,"{""message"": ""x, y""}"'])
+
+    def test_rotation_writes_headers(self):
+        sink = CSVSink(self.path, buffer_size=1, rotate_bytes=60)
+        for i in range(6):
+            sink.write(1, {'a': points(1, start=i)})
+        sink.close()
+        for path in sink.rotated + [self.path]:
+            self.assertEqual(read_lines(path)[0],
+                             'test_id,result_id,offset,timestamp,value')
+
+
+@unittest.skipIf(optional_import('pyarrow') is None, "pyarrow not installed")
+class TestSinksParquetSink(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'results.parquet')
+        self.url_id = TestResult.result_id_for_url('http://example.com/', 11,
+                                                   42, status_code=404)
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def test_to_arrow_table(self):
+        table = to_arrow_table(1, {
+            self.url_id: points(2),
+            TestResult.LIVE_FEEDBACK: [{'offset': 0, 'timestamp': 0,
+                                        'value': {'message': 'hi'}}]})
+        self.assertEqual(table.num_rows, 3)
+        rows = sorted(table.to_pylist(), key=lambda r: r['result_id'])
+        self.assertEqual(rows[0]['kind'], 'standard')
+        self.assertEqual(rows[0]['value'], None)
+        self.assertEqual(json.loads(rows[0]['value_json']), {'message': 'hi'})
+        self.assertEqual(rows[1]['kind'], 'url')
+        self.assertEqual(rows[1]['load_zone_id'], 11)
+        self.assertEqual(rows[1]['user_scenario_id'], 42)
+        self.assertEqual(rows[1]['status_code'], 404)
+        self.assertEqual(rows[1]['method'], 'GET')
+        self.assertEqual(rows[2]['value'], 1.0)
+        self.assertEqual(str(table.schema.field('timestamp').type),
+                         'timestamp[us, tz=UTC]')
+
+    def test_write_row_groups(self):
+        import pyarrow.parquet
+        with ParquetSink(self.path, row_group_size=4) as sink:
+            for i in range(5):
+                sink.consume(MockStream(),
+                             {self.url_id: points(2, start=2 * i)})
+        self.assertEqual(sink.rows_written, 10)
+        f = pyarrow.parquet.ParquetFile(self.path)
+        self.assertTrue(1 < f.num_row_groups)
+        table = f.read()
+        self.assertEqual(table.column('offset').to_pylist(), list(range(10)))
+        self.assertEqual(set(table.column('test_id').to_pylist()), set([1]))
+
+    def test_write_after_close(self):
+        import pyarrow.parquet
+        sink = ParquetSink(self.path)
+        for i in range(2):
+            sink.write(1, {self.url_id: points(1, start=i)})
+            sink.close()
+        self.assertEqual(sink.rows_written, 2)
+        self.assertEqual(sink.paths, [
+            self.path, os.path.join(self.dir, 'results.1.parquet')])
+        self.assertEqual([pyarrow.parquet.read_table(p).num_rows
+                          for p in sink.paths], [1, 1])
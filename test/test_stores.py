@@ -0,0 +1,139 @@
+# coding=utf-8
+
+"""
+Copyright 2015 Load Impact
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from loadimpact.clients import Client
+from loadimpact.resources import Test
+from loadimpact.stores import ResultStore
+
+
+class MockRequestsResponse(object):
+    def __init__(self, status_code=200, body=None):
+        self.url = 'http://example.com/'
+        self.status_code = status_code
+        self.text = ''
+        self.body = body
+
+    def json(self):
+        return self.body
+
+
+class MockResultsClient(Client):
+    """Serves result data points from `data`, `page_size` points at a time."""
+
+    def __init__(self, data, page_size=2, status=Test.STATUS_FINISHED):
+        super(MockResultsClient, self).__init__()
+        self.data = data
+        self.page_size = page_size
+        self.status = status
+        self.requested_ids = []
+
+    def _requests_request(self, method, url, **kwargs):
+        if not url.endswith('/results'):
+            return MockRequestsResponse(body={'id': 1, 'status': self.status})
+        ids = kwargs['params']['ids']
+        self.requested_ids.append(ids)
+        body = {}
+        for q in ids.split(','):
+            rid, offset = q.split('|')
+            points = [p for p in self.data.get(rid, [])
+                      if p['offset'] > int(offset)]
+            body[rid] = points[:self.page_size]
+        return MockRequestsResponse(body=body)
+
+
+def points(n, start=0):
+    return [{'offset': i, 'timestamp': 1000 * i, 'value': float(i)}
+            for i in range(start, start + n)]
+
+
+class TestStoresResultStore(unittest.TestCase):
+    def setUp(self):
+        self.store = ResultStore()
+
+    def tearDown(self):
+        self.store.close()
+
+    def test_write(self):
+        written = self.store.write(1, {'a': points(3), 'b': points(2)})
+        self.assertEqual(written, 5)
+        self.assertEqual(self.store.result_ids(1), ['a', 'b'])
+        self.assertEqual(self.store.result_ids(2), [])
+
+    def test_write_ignores_stored_offsets(self):
+        self.store.write(1, {'a': points(3)})
+        written = self.store.write(1, {'a': points(3, start=1)})
+        self.assertEqual(written, 1)
+        self.assertEqual(self.store.series(1, 'a'), points(4))
+
+    def test_last_offset(self):
+        self.assertEqual(self.store.last_offset(1, 'a'), -1)
+        self.store.write(1, {'a': points(3)})
+        self.assertEqual(self.store.last_offset(1, 'a'), 2)
+
+    def test_series_range(self):
+        self.store.write(1, {'a': points(10)})
+        self.assertEqual(self.store.series(1, 'a', start=2000, end=4000),
+                         points(3, start=2))
+        self.assertEqual(self.store.series(1, 'a', after_offset=7),
+                         points(2, start=8))
+
+    def test_series_dict_values(self):
+        point = {'offset': 0, 'timestamp': 0, 'value': {'message': 'hello'}}
+        self.store.write(1, {'a': [point]})
+        self.assertEqual(self.store.series(1, 'a'), [point])
+
+    def test_load(self):
+        client = MockResultsClient({'a': points(5), 'b': points(3)})
+        test = Test(client, id=1)
+        series = self.store.load(test, ['a', 'b'])
+        self.assertEqual(series, {'a': points(5), 'b': points(3)})
+
+    def test_load_fetches_missing_offsets_only(self):
+        self.store.write(1, {'a': points(4)})
+        client = MockResultsClient({'a': points(5)})
+        test = Test(client, id=1)
+        series = self.store.load(test, ['a'])
+        self.assertEqual(series, {'a': points(5)})
+        self.assertEqual(client.requested_ids, ['a|3', 'a|4'])
+
+    def test_persistence(self):
+        path = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(path, 'results.db')
+            store = ResultStore(filename)
+            store.write(1, {'a': points(3)})
+            store.close()
+            store = ResultStore(filename)
+            self.assertEqual(store.series(1, 'a'), points(3))
+            store.close()
+        finally:
+            shutil.rmtree(path)
+
+    def test_attach_to_stream(self):
+        client = MockResultsClient({'a': points(5)}, page_size=10)
+        test = Test(client, id=1)
+        stream = test.result_stream(['a'])
+        stream.attach(self.store)
+        for _ in stream(poll_rate=0, post_polls=0):
+            pass
+        self.assertEqual(self.store.series(1, 'a'), points(5))
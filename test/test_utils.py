@@ -18,7 +18,8 @@ limitations under the License.
 
 import unittest
 
-from loadimpact.utils import is_dict_different, UTC
+from loadimpact.utils import (
+    BackgroundCall, LRUDict, is_dict_different, map_concurrently, UTC)
 
 
 class TestUtilsFunctions(unittest.TestCase):
@@ -115,6 +116,52 @@ class TestUtilsFunctions(unittest.TestCase):
         }
         self.assertTrue(is_dict_different(d1, d2))
 
+    def test_map_concurrently(self):
+        self.assertEqual(map_concurrently(lambda x: x * 2, range(10),
+                                          max_workers=3),
+                         [x * 2 for x in range(10)])
+
+    def test_map_concurrently_empty(self):
+        self.assertEqual(map_concurrently(lambda x: x, []), [])
+
+    def test_map_concurrently_raises(self):
+        def fail(x):
+            if 5 == x:
+                raise ValueError(x)
+            return x
+        self.assertRaises(ValueError, map_concurrently, fail, range(10))
+
+
+class TestUtilsBackgroundCall(unittest.TestCase):
+    def test_result(self):
+        call = BackgroundCall(lambda a, b=0: a + b, 1, b=2)
+        self.assertEqual(call.result(), 3)
+
+    def test_error(self):
+        call = BackgroundCall(int, 'x')
+        self.assertRaises(ValueError, call.result)
+
+
+class TestUtilsLRUDict(unittest.TestCase):
+    def test_evicts_least_recently_set(self):
+        d = LRUDict(2)
+        d['a'] = 1
+        d['b'] = 2
+        d['a'] = 3
+        d['c'] = 4
+        self.assertEqual(len(d), 2)
+        self.assertFalse('b' in d)
+        self.assertEqual((d['a'], d.get('c'), d.get('b')), (3, 4, None))
+
+    def test_purges_outdated_entries(self):
+        d = LRUDict(2)
+        for i in range(100):
+            d['a'] = i
+        self.assertTrue(len(d._order) <= 2 * len(d) + 8)
+        d['b'] = 0
+        d['c'] = 0
+        self.assertEqual(sorted(d._items), ['b', 'c'])
+
 
 class TestUtilsUTC(unittest.TestCase):
     def setUp(self):
@@ -133,3 +180,6 @@ class TestUtilsUTC(unittest.TestCase):
 
     def test_dst(self):
         self.assertTimeDeltaZero(self.tz.dst(None))
+
+    def test_singleton(self):
+        self.assertTrue(UTC() is self.tz)
@@ -0,0 +1,260 @@
+# coding=utf-8
+
+"""
+Copyright 2015 Load Impact
+
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+
+    http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing, software
+distributed under the License is distributed on an "AS IS" BASIS,
+WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+See the License for the specific language governing permissions and
+limitations under the License.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+from loadimpact import validations
+from loadimpact.clients import Client
+from loadimpact.exceptions import ServerError
+from loadimpact.resources import UserScenario, UserScenarioValidation
+from loadimpact.validations import ValidationCache, validate_user_scenarios
+
+
+RUNNING = UserScenarioValidation.STATUS_RUNNING
+FINISHED = UserScenarioValidation.STATUS_FINISHED
+FAILED = UserScenarioValidation.STATUS_FAILED
+
+
+class MockRequestsResponse(object):
+    def __init__(self, status_code=200, body=None):
+        self.url = 'http://example.com/'
+        self.status_code = status_code
+        self.text = ''
+        self.body = body or {}
+
+    def json(self):
+        return self.body
+
+
+class MockValidationClient(Client):
+    """Serves scripted result polls per user scenario ID; user scenario 0
+    can't be validated."""
+
+    def __init__(self, polls):
+        super(MockValidationClient, self).__init__()
+        self.polls = polls
+        self.statuses = {}
+        self.lock = threading.Lock()
+
+    def _requests_request(self, method, url, **kwargs):
+        parts = url.rstrip('/').split('/')
+        if 'post' == method:
+            usid = json.loads(kwargs['data'])['user_scenario_id']
+            if not usid:
+                return MockRequestsResponse(status_code=500)
+            return MockRequestsResponse(body={
+                'id': usid, 'user_scenario_id': usid, 'status': 0})
+        if 'results' == parts[-1]:
+            with self.lock:
+                body = self.polls[int(parts[-2])].pop(0)
+                self.statuses[int(parts[-2])] = body.get('status')
+            return MockRequestsResponse(body=body)
+        vid = int(parts[-1])
+        return MockRequestsResponse(body={
+            'id': vid, 'user_scenario_id': vid,
+            'status': self.statuses.get(vid)})
+
+
+def log(*offsets):
+    return [{'offset': i, 'timestamp': i, 'message': 'line %d' % i}
+            for i in offsets]
+
+
+class TestValidationsValidateUserScenarios(unittest.TestCase):
+    def setUp(self):
+        self.sleeps = []
+        self._sleep = validations.sleep
+        validations.sleep = self.sleeps.append
+
+    def tearDown(self):
+        validations.sleep = self._sleep
+
+    def test_validate_user_scenarios(self):
+        client = MockValidationClient({
+            1: [{'status': RUNNING, 'results': log(0)},
+                {'status': FINISHED, 'results': log(1)}],
+            2: [{'status': RUNNING},
+                {'status': RUNNING},
+                {'status': FAILED, 'results': log(0)}]
+        })
+        scenarios = [UserScenario(client, id=i) for i in (1, 2, 0)]
+        report = validate_user_scenarios(scenarios, poll_rate=0,
+                                         max_poll_rate=0)
+
+        self.assertEqual(len(report), 3)
+        self.assertFalse(report.passed)
+        first, second, third = list(report)
+        self.assertTrue(first.passed)
+        self.assertEqual(first.validation.status, FINISHED)
+        self.assertEqual([r['offset'] for r in first.results], [0, 1])
+        self.assertFalse(second.passed)
+        self.assertEqual(second.status_text, 'failed')
+        self.assertEqual(second.stream.polls, 3)
+        self.assertTrue(isinstance(third.error, ServerError))
+        self.assertEqual(third.results, [])
+        self.assertEqual(report.failures, [second, third])
+        for outcome in report:
+            self.assertTrue(outcome.duration >= 0)
+        self.assertEqual(client.polls, {1: [], 2: []})
+
+        summary = report.summary().splitlines()
+        self.assertTrue(summary[0].startswith('PASS 1: finished'))
+        self.assertTrue(summary[1].startswith('FAIL 2: failed'))
+        self.assertTrue(summary[3].startswith('1/3 passed'))
+
+    def test_idle_backoff_minimum(self):
+        client = MockValidationClient({
+            1: [{'status': RUNNING}, {'status': RUNNING},
+                {'status': RUNNING}, {'status': FINISHED}]
+        })
+        validate_user_scenarios([UserScenario(client, id=1)], poll_rate=0)
+        self.assertEqual(self.sleeps, [0.5, 1.0, 2.0])
+
+    def test_max_results(self):
+        client = MockValidationClient({
+            1: [{'status': FINISHED, 'results': log(0, 1, 2)}]
+        })
+        report = validate_user_scenarios([UserScenario(client, id=1)],
+                                         poll_rate=0, max_results=1)
+        self.assertTrue(report.passed)
+        self.assertEqual([r['offset'] for r in report.outcomes[0].results],
+                         [2])
+
+
+class TestValidationsValidationCache(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'validations.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def _user_scenario(self, client, load_script='script'):
+        return UserScenario._load(client, {
+            'id': 1, 'load_script': load_script, 'data_stores': [2, 1]})
+
+    def _validate(self, cache, user_scenario):
+        validation = user_scenario.validate(cache=cache)
+        return validation, list(validation.result_stream()(poll_rate=0))
+
+    def test_key(self):
+        a = self._user_scenario(None)
+        b = UserScenario(None, id=2, load_script='script', data_stores=[1, 2])
+        c = self._user_scenario(None, load_script='changed')
+        self.assertEqual(ValidationCache.key(a), ValidationCache.key(b))
+        self.assertNotEqual(ValidationCache.key(a), ValidationCache.key(c))
+
+    def test_validate_cached(self):
+        client = MockValidationClient({
+            1: [{'status': FINISHED, 'results': log(0, 1)}]
+        })
+        cache = ValidationCache(path=self.path)
+        user_scenario = self._user_scenario(client)
+        validation, results = self._validate(cache, user_scenario)
+        self.assertEqual(len(cache), 1)
+
+        # Served from cache without requests, also after reloading it.
+        cache = ValidationCache(path=self.path)
+        cached, cached_results = self._validate(cache, user_scenario)
+        self.assertEqual(client.polls, {1: []})
+        self.assertEqual(cached.id, validation.id)
+        self.assertEqual(cached.status, FINISHED)
+        self.assertEqual(cached_results, results)
+
+        report = validate_user_scenarios([user_scenario], poll_rate=0,
+                                         cache=cache)
+        self.assertTrue(report.outcomes[0].cached)
+        self.assertTrue(report.passed)
+        self.assertEqual(report.outcomes[0].results, results)
+
+    def test_cached_log_not_truncated(self):
+        client = MockValidationClient({
+            1: [{'status': RUNNING, 'results': log(0, 1)},
+                {'status': FINISHED, 'results': log(2)}]
+        })
+        cache = ValidationCache()
+        user_scenario = self._user_scenario(client)
+        report = validate_user_scenarios([user_scenario], poll_rate=0,
+                                         max_results=1, cache=cache)
+        self.assertEqual(len(report.outcomes[0].results), 1)
+        cached, cached_results = self._validate(cache, user_scenario)
+        self.assertEqual([r['offset'] for r in cached_results], [0, 1, 2])
+
+    def test_validate_changed(self):
+        client = MockValidationClient({
+            1: [{'status': FINISHED}, {'status': FINISHED}]
+        })
+        cache = ValidationCache()
+        self._validate(cache, self._user_scenario(client))
+        self._validate(cache, self._user_scenario(client, 'changed'))
+        self.assertEqual(client.polls, {1: []})
+        self.assertEqual(len(cache), 2)
+
+    def test_validate_unsaved(self):
+        client = MockValidationClient({
+            1: [{'status': FINISHED}, {'status': FINISHED}]
+        })
+        cache = ValidationCache()
+        user_scenario = self._user_scenario(client)
+        self._validate(cache, user_scenario)
+        self.assertEqual(len(cache), 1)
+
+        # The API validates the saved script, so neither served from nor
+        # recorded in the cache under the key of the unsaved one.
+        user_scenario.load_script = 'changed'
+        validation, results = self._validate(cache, user_scenario)
+        self.assertEqual(validation.cache, None)
+        self.assertEqual(client.polls, {1: []})
+        self.assertEqual(len(cache), 1)
+        user_scenario = self._user_scenario(client)
+        user_scenario.data_stores.append(3)
+        self.assertEqual(user_scenario.validate(cache=cache).cache, None)
+
+    def test_failed_not_cached(self):
+        client = MockValidationClient({1: [{'status': FAILED}]})
+        cache = ValidationCache()
+        self._validate(cache, self._user_scenario(client))
+        self.assertEqual(len(cache), 0)
+
+        client = MockValidationClient({1: [{'status': FAILED}]})
+        cache = ValidationCache(include_failed=True)
+        self._validate(cache, self._user_scenario(client))
+        self.assertEqual(len(cache), 1)
+
+    def test_ttl(self):
+        client = MockValidationClient({1: [{'status': FINISHED}]})
+        cache = ValidationCache(ttl=-1)
+        user_scenario = self._user_scenario(client)
+        self._validate(cache, user_scenario)
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache.get(user_scenario), None)
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidate(self):
+        client = MockValidationClient({1: [{'status': FINISHED}]})
+        cache = ValidationCache(path=self.path)
+        user_scenario = self._user_scenario(client)
+        self._validate(cache, user_scenario)
+        cache.invalidate(user_scenario)
+        self.assertEqual(cache.get(user_scenario), None)
+        self.assertEqual(len(ValidationCache(path=self.path)), 0)